@@ -1,11 +1,21 @@
 """Healthcare Procurement Spend Analytics Dashboard."""
+import io
+import logging
+import os
+from datetime import timedelta
+from typing import Callable
+
+import pandas as pd
 import streamlit as st
 
 from utils.data_processing import (
-    apply_filters,
-    calculate_kpis,
+    EXPECTED_COLUMNS,
+    Partition,
+    calculate_period_kpis,
     calculate_prior_period,
-    load_data,
+    calculate_range_kpis,
+    take_rows,
+    widen_money,
 )
 from utils.charts import (
     contract_type_by_category,
@@ -17,6 +27,100 @@ from utils.charts import (
     top_vendors_by_spend,
     vendor_treemap,
 )
+from utils.aggregations import AggregationContext
+from utils.export import EXPORT_FORMATS, export_file, iter_row_chunks
+from utils.indexing import DimensionMasks, FilterIndex, page_of
+from utils.ingest import load_store
+from utils.profiling import configure_perf_log, stage, start_run
+from utils.result_cache import filter_signature, load_result_cache
+from utils.sql_backend import load_sql_backend
+
+RESULT_CACHE_MAX_BYTES = (
+    int(os.environ.get("RESULT_CACHE_MB", "256")) * 1024 * 1024
+)
+
+CHART_BUILDERS = {
+    "spend_by_category": spend_by_category,
+    "monthly_spend_trend": monthly_spend_trend,
+    "top_vendors_by_spend": top_vendors_by_spend,
+    "vendor_treemap": vendor_treemap,
+    "spend_by_facility": spend_by_facility,
+    "facility_ppi_mix": facility_ppi_mix,
+    "contract_type_by_category": contract_type_by_category,
+    "off_contract_opportunities": off_contract_opportunities,
+}
+
+TAB_CHARTS = {
+    "Spend Overview": ["spend_by_category", "monthly_spend_trend"],
+    "Vendor Analysis": ["top_vendors_by_spend", "vendor_treemap"],
+    "Facility Comparison": ["spend_by_facility", "facility_ppi_mix"],
+    "Contract Analysis": [
+        "contract_type_by_category",
+        "off_contract_opportunities",
+    ],
+}
+
+# How often, at most, source files are checked for appended rows (or,
+# with the SQL backend, for changes that require a rebuild).
+DATA_REFRESH_SECONDS = float(os.environ.get("DATA_REFRESH_SECONDS", "60"))
+
+# With a partitioned dataset, the dashboard opens on the latest
+# DEFAULT_WINDOW_DAYS days and loads only the partitions that window
+# (and its prior period) needs; choosing earlier dates loads more.
+# 0 opens on, and loads, every day.
+DEFAULT_WINDOW_DAYS = int(os.environ.get("DEFAULT_WINDOW_DAYS", "0"))
+
+# Unique vendors are estimated from sketches unless exact counts are
+# requested; filters on vendor, contract type or PPI are always exact.
+EXACT_DISTINCT = os.environ.get("EXACT_DISTINCT", "0") == "1"
+
+# "sql" answers every query from the embedded SQL backend instead of
+# the in-memory frame, cube and indexes.
+QUERY_BACKEND = os.environ.get("QUERY_BACKEND", "memory")
+
+# In lazy mode only the selected tab's charts are built on a rerun.
+LAZY_TABS = os.environ.get("LAZY_TABS", "1") != "0"
+
+EXPLORER_PAGE_SIZES = [25, 50, 100, 250, 500]
+EXPORT_CHUNK_ROWS = 100_000
+
+# Streamlit holds a download in memory while serving it (see
+# ``export_file``), so larger selections are not offered for export.
+EXPORT_MAX_ROWS = int(os.environ.get("EXPORT_MAX_ROWS", "500000"))
+
+# Stage timings are logged to stderr as JSON lines unless PERF_LOG=0;
+# PERF_PANEL=1 also shows them in a sidebar "Performance" panel.
+PERF_LOG = os.environ.get("PERF_LOG", "1") != "0"
+PERF_PANEL = os.environ.get("PERF_PANEL", "0") == "1"
+
+# Level of the dashboard's own log lines (data loads, appends, schema
+# sizes), written to stderr apart from Streamlit's.
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+
+
+def _configure_logging() -> None:
+    """Give the ``utils`` loggers a handler and ``LOG_LEVEL``.
+
+    Under ``streamlit run`` the root logger has no handler and only
+    passes warnings, so without this their INFO lines are dropped.
+    The handler is added once per process, not on every rerun.
+    """
+    logger = logging.getLogger("utils")
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(
+            logging.Formatter(
+                "%(asctime)s %(levelname)s %(name)s: %(message)s"
+            )
+        )
+        logger.addHandler(handler)
+
+
+_configure_logging()
+configure_perf_log(PERF_LOG)
+run_profile = start_run()
 
 st.set_page_config(
     page_title="Healthcare Spend Analytics",
@@ -154,29 +258,173 @@ def _render_kpi_card(
     )
 
 
-df_full = load_data()
+def _render_spend_overview(figures: dict) -> None:
+    """Render the Spend Overview tab."""
+    col1, col2 = st.columns([1, 1.5])
+    with col1:
+        st.plotly_chart(
+            figures["spend_by_category"],
+            use_container_width=True,
+        )
+    with col2:
+        st.plotly_chart(
+            figures["monthly_spend_trend"],
+            use_container_width=True,
+        )
+
+
+def _render_vendor_analysis(figures: dict) -> None:
+    """Render the Vendor Analysis tab."""
+    col1, col2 = st.columns([1.2, 1])
+    with col1:
+        st.plotly_chart(
+            figures["top_vendors_by_spend"],
+            use_container_width=True,
+        )
+    with col2:
+        st.plotly_chart(
+            figures["vendor_treemap"],
+            use_container_width=True,
+        )
+
+
+def _render_facility_comparison(figures: dict) -> None:
+    """Render the Facility Comparison tab."""
+    col1, col2 = st.columns(2)
+    with col1:
+        st.plotly_chart(
+            figures["spend_by_facility"],
+            use_container_width=True,
+        )
+    with col2:
+        st.plotly_chart(
+            figures["facility_ppi_mix"],
+            use_container_width=True,
+        )
+
+
+def _render_contract_analysis(figures: dict) -> None:
+    """Render the Contract Analysis tab."""
+    col1, col2 = st.columns([1.2, 1])
+    with col1:
+        st.plotly_chart(
+            figures["contract_type_by_category"],
+            use_container_width=True,
+        )
+    with col2:
+        st.markdown(
+            '<p class="section-header">'
+            "Off-Contract Spend Opportunities"
+            "</p>",
+            unsafe_allow_html=True,
+        )
+        st.caption(
+            "Categories with >20% off-contract spend represent "
+            "potential savings from contract renegotiation."
+        )
+        opp_df = figures["off_contract_opportunities"]
+        if opp_df.empty:
+            st.info(
+                "No categories exceed the 20% off-contract threshold "
+                "in the current filter selection."
+            )
+        else:
+            opp_display = opp_df.copy()
+            opp_display["Total Category Spend"] = opp_display[
+                "Total Category Spend"
+            ].apply(lambda v: f"${v:,.0f}")
+            opp_display["Off-Contract Spend"] = opp_display[
+                "Off-Contract Spend"
+            ].apply(lambda v: f"${v:,.0f}")
+            opp_display["Off-Contract %"] = opp_display[
+                "Off-Contract %"
+            ].apply(lambda v: f"{v:.1f}%")
+            st.dataframe(
+                opp_display,
+                use_container_width=True,
+                hide_index=True,
+            )
+
+
+TAB_RENDERERS = {
+    "Spend Overview": _render_spend_overview,
+    "Vendor Analysis": _render_vendor_analysis,
+    "Facility Comparison": _render_facility_comparison,
+    "Contract Analysis": _render_contract_analysis,
+}
+
+
+def _filter_options(cube, partitions: list[Partition] = ()) -> dict:
+    """Return the sidebar's date bounds and choices from the cube.
+
+    The earliest date also covers ``partitions`` not loaded yet.
+    """
+    min_date = cube["transaction_date"].min().date()
+    if partitions:
+        min_date = min(min_date, min(p.month for p in partitions))
+    return {
+        "min_date": min_date,
+        "max_date": cube["transaction_date"].max().date(),
+        "facilities": sorted(cube["facility_name"].unique().tolist()),
+        "categories": sorted(cube["spend_category"].unique().tolist()),
+        "vendors": (
+            cube.groupby("vendor_name", observed=True)["total_amount"]
+            .sum()
+            .sort_values(ascending=False)
+            .index.tolist()
+        ),
+        "contract_types": sorted(cube["contract_type"].unique().tolist()),
+    }
+
+
+if QUERY_BACKEND == "sql":
+    with stage("load_sql_backend"):
+        sql_backend = load_sql_backend(
+            refresh_seconds=DATA_REFRESH_SECONDS
+        )
+    data_version = sql_backend.path.name
+    filter_options = sql_backend.filter_options()
+else:
+    sql_backend = None
+    with stage("load_store"):
+        store = load_store(
+            compact=True,
+            refresh_seconds=DATA_REFRESH_SECONDS,
+            window_days=DEFAULT_WINDOW_DAYS or None,
+        )
+    with stage("refresh") as record:
+        try:
+            record.rows = store.refresh()
+        except ValueError as exc:
+            st.warning(f"New data was not loaded: {exc}")
+    filter_options = _filter_options(store.snapshot.cube, store.partitions())
 
 # --- Sidebar Filters ---
 with st.sidebar:
     st.markdown("### Filters")
 
-    min_date = df_full["transaction_date"].min().date()
-    max_date = df_full["transaction_date"].max().date()
+    min_date = filter_options["min_date"]
+    max_date = filter_options["max_date"]
 
     if "filter_reset" not in st.session_state:
         st.session_state["filter_reset"] = 0
 
     reset_key = st.session_state["filter_reset"]
 
+    default_start = min_date
+    if DEFAULT_WINDOW_DAYS:
+        default_start = max(
+            min_date, max_date - timedelta(days=DEFAULT_WINDOW_DAYS - 1)
+        )
     date_range = st.date_input(
         "Date Range",
-        value=(min_date, max_date),
+        value=(default_start, max_date),
         min_value=min_date,
         max_value=max_date,
         key=f"date_range_{reset_key}",
     )
 
-    all_facilities = sorted(df_full["facility_name"].unique().tolist())
+    all_facilities = filter_options["facilities"]
     selected_facilities = st.multiselect(
         "Facility",
         options=all_facilities,
@@ -184,9 +432,7 @@ with st.sidebar:
         key=f"facilities_{reset_key}",
     )
 
-    all_categories = sorted(
-        df_full["spend_category"].unique().tolist()
-    )
+    all_categories = filter_options["categories"]
     selected_categories = st.multiselect(
         "Spend Category",
         options=all_categories,
@@ -194,12 +440,7 @@ with st.sidebar:
         key=f"categories_{reset_key}",
     )
 
-    vendor_spend_order = (
-        df_full.groupby("vendor_name")["total_amount"]
-        .sum()
-        .sort_values(ascending=False)
-        .index.tolist()
-    )
+    vendor_spend_order = filter_options["vendors"]
     selected_vendors = st.multiselect(
         "Vendor",
         options=vendor_spend_order,
@@ -208,9 +449,7 @@ with st.sidebar:
         key=f"vendors_{reset_key}",
     )
 
-    all_contract_types = sorted(
-        df_full["contract_type"].unique().tolist()
-    )
+    all_contract_types = filter_options["contract_types"]
     selected_contracts = st.multiselect(
         "Contract Type",
         options=all_contract_types,
@@ -266,8 +505,7 @@ if isinstance(date_range, tuple) and len(date_range) == 2:
 else:
     filter_date_range = (min_date, max_date)
 
-df_filtered = apply_filters(
-    df_full,
+filter_kwargs = dict(
     date_range=filter_date_range,
     facilities=selected_facilities if selected_facilities else None,
     categories=(
@@ -280,11 +518,213 @@ df_filtered = apply_filters(
     ppi_only=ppi_only,
 )
 
+if sql_backend is None:
+    # The prior period ends the day before the range and is as long.
+    needed_since = filter_date_range[0] - (
+        filter_date_range[1] - filter_date_range[0] + timedelta(days=1)
+    )
+    with stage("widen") as record:
+        if store.widen(needed_since):
+            record.rows = len(store.snapshot.df)
+    snapshot = store.snapshot
+    df_full = snapshot.df
+    filter_index = snapshot.filter_index
+    cube = snapshot.cube
+    cube_index = snapshot.cube_index
+    prefix_sums = snapshot.prefix_sums
+    vendor_sketches = None if EXACT_DISTINCT else snapshot.vendor_sketches
+    data_version = snapshot.version
+
+view_signature = (data_version, filter_signature(**filter_kwargs))
+
+
+def _dimension_masks(key: str, index: FilterIndex) -> DimensionMasks:
+    """Return this session's reusable masks over ``index``."""
+    masks = st.session_state.get(key)
+    if masks is None or masks.index is not index:
+        masks = DimensionMasks(index)
+        st.session_state[key] = masks
+    return masks
+
+
+def _build_view() -> dict:
+    """Compute the filtered rows and KPIs for the selection.
+
+    KPIs and charts are answered from the pre-aggregated cube; raw
+    transaction positions are kept only for the Data Explorer. Chart
+    outputs are cached separately by ``_tab_figures``; the view is
+    shared by every session and never modified once cached.
+
+    With the SQL backend the KPIs are queried instead and no row
+    positions are kept.
+    """
+    if sql_backend is not None:
+        view_kpis = sql_backend.kpis(**filter_kwargs)
+        return {
+            "empty": view_kpis["transaction_count"] == 0,
+            "kpis": view_kpis,
+            "prior_kpis": sql_backend.prior_period_kpis(
+                filter_date_range[0], filter_date_range[1]
+            ),
+        }
+
+    cube_rows = _dimension_masks("cube_masks", cube_index).rows(
+        **filter_kwargs
+    )
+
+    if selected_vendors or selected_contracts or ppi_only:
+        view_kpis, prior_kpis = calculate_period_kpis(
+            cube, filter_date_range[0], filter_date_range[1], rows=cube_rows
+        )
+    else:
+        view_kpis = calculate_range_kpis(
+            prefix_sums,
+            filter_date_range[0],
+            filter_date_range[1],
+            facilities=filter_kwargs["facilities"],
+            categories=filter_kwargs["categories"],
+            df=take_rows(cube, cube_rows) if vendor_sketches is None else None,
+            sketches=vendor_sketches,
+        )
+        prior_kpis = calculate_prior_period(
+            cube,
+            filter_date_range[0],
+            filter_date_range[1],
+            prefix_sums=prefix_sums,
+            sketches=vendor_sketches,
+        )
+
+    return {
+        "cube_rows": cube_rows,
+        "rows": _dimension_masks("row_masks", filter_index).rows(
+            **filter_kwargs
+        ),
+        "empty": view_kpis["transaction_count"] == 0,
+        "kpis": view_kpis,
+        "prior_kpis": prior_kpis,
+    }
+
+
+def _tab_figures(tabs: list[str]) -> dict:
+    """Return the chart outputs of ``tabs``, building missing ones.
+
+    Each tab's outputs are cached under ``(view_signature, tab)``, so
+    a tab is built at most once per filter selection and cached
+    entries are never modified after they are stored.
+    """
+    figures = {}
+    missing = []
+    for tab in tabs:
+        cached = result_cache.get((view_signature, tab))
+        if cached is None:
+            missing.append(tab)
+        else:
+            figures.update(cached)
+    if missing:
+        with stage("charts"):
+            if sql_backend is not None:
+                aggregations = sql_backend.aggregation_context(
+                    **filter_kwargs
+                )
+            else:
+                aggregations = AggregationContext(
+                    take_rows(cube, view["cube_rows"])
+                )
+            for tab in missing:
+                built = {
+                    name: CHART_BUILDERS[name](aggregations)
+                    for name in TAB_CHARTS[tab]
+                }
+                result_cache.put((view_signature, tab), built)
+                figures.update(built)
+    return figures
+
+
+def _explorer_page(
+    sort_column: str, descending: bool, offset: int, limit: int
+) -> pd.DataFrame:
+    """Return one sorted page of the selected transactions.
+
+    The selection sorted by ``sort_column`` is cut from the snapshot's
+    presorted ``SortIndex`` once and kept in the result cache under
+    ``(view_signature, "explorer", sort_column)``, so later page turns
+    and direction flips only slice it. The whole frame's order is
+    already held by the index and is not cached again. The SQL
+    backend sorts and pages in the query instead.
+    """
+    if sql_backend is not None:
+        return sql_backend.page_rows(
+            sort_column, descending, offset, limit, **filter_kwargs
+        )
+    rows, n_rows = view["rows"], len(df_full)
+    if isinstance(rows, slice) and rows.indices(n_rows) == (0, n_rows, 1):
+        ordered = snapshot.sort_index.sorted_rows(sort_column, rows)
+    else:
+        ordered = result_cache.get_or_compute(
+            (view_signature, "explorer", sort_column),
+            lambda: snapshot.sort_index.sorted_rows(sort_column, rows),
+        )
+    positions = page_of(ordered, descending, offset, limit)
+    return widen_money(df_full.take(positions))
+
+
+def _export_data(fmt: str) -> Callable[[], io.RawIOBase]:
+    """Return a callable that exports the selection in ``fmt``.
+
+    Streamlit only runs it when the download button is clicked, on
+    its own thread, so it captures everything it needs now. Rows are
+    written in chunks of ``EXPORT_CHUNK_ROWS`` to a temporary file,
+    which Streamlit then holds in memory while serving it; see
+    ``export_file``. Selections over ``EXPORT_MAX_ROWS`` rows are not
+    offered for export, which bounds that memory.
+    """
+    if sql_backend is not None:
+        backend, filters = sql_backend, dict(filter_kwargs)
+        return lambda: export_file(
+            backend.iter_rows(EXPORT_CHUNK_ROWS, **filters), fmt
+        )
+    frame, rows = df_full, view["rows"]
+    return lambda: export_file(
+        iter_row_chunks(frame, rows, EXPORT_CHUNK_ROWS), fmt
+    )
+
+
+def _finish_run() -> None:
+    """Log this rerun's stage timings and show them if enabled."""
+    run_profile.log()
+    if not PERF_PANEL:
+        return
+    with st.sidebar.expander("Performance", expanded=True):
+        st.caption(
+            f"Rerun {run_profile.total_seconds * 1000:,.0f} ms · "
+            f"view cache {result_cache.hits} hits / "
+            f"{result_cache.misses} misses"
+        )
+        timings = run_profile.to_frame()
+        timings["stage"] = [
+            "\u2003" * depth + name
+            for depth, name in zip(timings["depth"], timings["stage"])
+        ]
+        timings["ms"] = timings["seconds"] * 1000
+        st.dataframe(
+            timings[["stage", "ms", "rows", "cache_hit"]],
+            hide_index=True,
+            use_container_width=True,
+            column_config={
+                "ms": st.column_config.NumberColumn(format="%.1f"),
+            },
+        )
+
+
+# A repeated selection is served from the shared result cache.
+result_cache = load_result_cache(RESULT_CACHE_MAX_BYTES)
+with stage("view") as record:
+    record.cache_hit = view_signature in result_cache
+    view = result_cache.get_or_compute(view_signature, _build_view)
+kpis = view["kpis"]
+prior_kpis = view["prior_kpis"]
+
 # --- Header ---
-kpis = calculate_kpis(df_filtered)
-prior_kpis = calculate_prior_period(
-    df_full, filter_date_range[0], filter_date_range[1]
-)
 
 date_display_start = filter_date_range[0].strftime("%b %Y")
 date_display_end = filter_date_range[1].strftime("%b %Y")
@@ -359,113 +799,92 @@ with kpi_cols[4]:
 st.markdown("")
 
 # --- Charts ---
-if df_filtered.empty:
+if view["empty"]:
     st.warning("No data matches the current filters.")
+    _finish_run()
     st.stop()
 
-tab1, tab2, tab3, tab4 = st.tabs([
-    "Spend Overview",
-    "Vendor Analysis",
-    "Facility Comparison",
-    "Contract Analysis",
-])
-
-with tab1:
-    col1, col2 = st.columns([1, 1.5])
-    with col1:
-        st.plotly_chart(
-            spend_by_category(df_filtered),
-            use_container_width=True,
-        )
-    with col2:
-        st.plotly_chart(
-            monthly_spend_trend(df_filtered),
-            use_container_width=True,
-        )
-
-with tab2:
-    col1, col2 = st.columns([1.2, 1])
-    with col1:
-        st.plotly_chart(
-            top_vendors_by_spend(df_filtered),
-            use_container_width=True,
-        )
-    with col2:
-        st.plotly_chart(
-            vendor_treemap(df_filtered),
-            use_container_width=True,
-        )
-
-with tab3:
-    col1, col2 = st.columns(2)
-    with col1:
-        st.plotly_chart(
-            spend_by_facility(df_filtered),
-            use_container_width=True,
-        )
-    with col2:
-        st.plotly_chart(
-            facility_ppi_mix(df_filtered),
-            use_container_width=True,
-        )
-
-with tab4:
-    col1, col2 = st.columns([1.2, 1])
-    with col1:
-        st.plotly_chart(
-            contract_type_by_category(df_filtered),
-            use_container_width=True,
-        )
-    with col2:
-        st.markdown(
-            '<p class="section-header">'
-            "Off-Contract Spend Opportunities"
-            "</p>",
-            unsafe_allow_html=True,
-        )
-        st.caption(
-            "Categories with >20% off-contract spend represent "
-            "potential savings from contract renegotiation."
-        )
-        opp_df = off_contract_opportunities(df_filtered)
-        if opp_df.empty:
-            st.info(
-                "No categories exceed the 20% off-contract threshold "
-                "in the current filter selection."
-            )
-        else:
-            opp_display = opp_df.copy()
-            opp_display["Total Category Spend"] = opp_display[
-                "Total Category Spend"
-            ].apply(lambda v: f"${v:,.0f}")
-            opp_display["Off-Contract Spend"] = opp_display[
-                "Off-Contract Spend"
-            ].apply(lambda v: f"${v:,.0f}")
-            opp_display["Off-Contract %"] = opp_display[
-                "Off-Contract %"
-            ].apply(lambda v: f"{v:.1f}%")
-            st.dataframe(
-                opp_display,
-                use_container_width=True,
-                hide_index=True,
-            )
+if LAZY_TABS:
+    active_tab = st.radio(
+        "View",
+        options=list(TAB_CHARTS),
+        horizontal=True,
+        label_visibility="collapsed",
+        key="active_tab",
+    )
+    TAB_RENDERERS[active_tab](_tab_figures([active_tab]))
+else:
+    figures = _tab_figures(list(TAB_CHARTS))
+    for tab, name in zip(st.tabs(list(TAB_CHARTS)), TAB_CHARTS):
+        with tab:
+            TAB_RENDERERS[name](figures)
 
 # --- Data Explorer ---
 st.divider()
 
-with st.expander("View Transaction Detail"):
+with st.expander("View Transaction Detail"), stage(
+    "data_explorer"
+) as explorer_stage:
+    n_matching = kpis["transaction_count"]
+    sort_col, order_col, size_col, page_col = st.columns([2, 1, 1, 1])
+    sort_column = sort_col.selectbox(
+        "Sort by",
+        options=EXPECTED_COLUMNS,
+        index=EXPECTED_COLUMNS.index("transaction_date"),
+        key="explorer_sort",
+    )
+    descending = (
+        order_col.selectbox(
+            "Order", options=["Descending", "Ascending"], key="explorer_dir"
+        )
+        == "Descending"
+    )
+    page_size = size_col.selectbox(
+        "Rows per page",
+        options=EXPLORER_PAGE_SIZES,
+        index=1,
+        key="explorer_page_size",
+    )
+    n_pages = max(1, -(-n_matching // page_size))
+    if st.session_state.get("explorer_page", 1) > n_pages:
+        st.session_state["explorer_page"] = 1
+    page = page_col.number_input(
+        "Page", min_value=1, max_value=n_pages, step=1, key="explorer_page"
+    )
+
+    offset = (page - 1) * page_size
+    page_rows = _explorer_page(sort_column, descending, offset, page_size)
+    explorer_stage.rows = len(page_rows)
+    st.caption(
+        f"Rows {offset + 1:,}–{offset + len(page_rows):,} "
+        f"of {n_matching:,} · page {page:,} of {n_pages:,}"
+    )
     st.dataframe(
-        df_filtered.sort_values(
-            "transaction_date", ascending=False
-        ).reset_index(drop=True),
+        page_rows,
         use_container_width=True,
-        height=400,
+        hide_index=True,
     )
 
-    csv_data = df_filtered.to_csv(index=False).encode("utf-8")
-    st.download_button(
-        label="Download Filtered Data as CSV",
-        data=csv_data,
-        file_name="healthcare_spend_filtered.csv",
-        mime="text/csv",
+    format_col, download_col = st.columns([1, 3])
+    export_label = format_col.selectbox(
+        "Export format",
+        options=list(EXPORT_FORMATS),
+        key="export_format",
+        label_visibility="collapsed",
     )
+    export_format, extension, mime = EXPORT_FORMATS[export_label]
+    if n_matching > EXPORT_MAX_ROWS:
+        download_col.caption(
+            f"Exports are limited to {EXPORT_MAX_ROWS:,} rows, because "
+            "the file is held in memory while it downloads. Narrow the "
+            f"filters to export these {n_matching:,} rows."
+        )
+    else:
+        download_col.download_button(
+            label=f"Download Filtered Data as {export_label}",
+            data=_export_data(export_format),
+            file_name=f"healthcare_spend_filtered.{extension}",
+            mime=mime,
+        )
+
+_finish_run()
@@ -0,0 +1,497 @@
+"""Benchmark the load -> filter -> KPI -> chart pipeline.
+
+Generates synthetic datasets with ``generate_data.py`` at each
+requested size, times every stage of a dashboard rerun under a set of
+representative filter selections, records peak memory, and writes the
+results as JSON so runs on different commits can be compared::
+
+    python benchmark.py --output bench-main.json
+    python benchmark.py --baseline bench-main.json --output bench-new.json
+
+With ``--baseline`` the script exits with status 1 when any stage is
+slower, or allocates more, than the baseline by more than the allowed
+ratio. Each dataset size is measured in its own process, so the peak
+memory and Streamlit caches of one size do not leak into the next.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Any, Callable
+
+import numpy as np
+import pandas as pd
+
+from generate_data import (
+    CATEGORIES,
+    END_DATE,
+    FACILITY_NAMES,
+    SEED,
+    START_DATE,
+    generate_data_parallel,
+)
+
+DEFAULT_SIZES = [10_000, 1_000_000, 10_000_000]
+DEFAULT_DATA_DIR = Path(__file__).parent / "data" / "benchmark"
+DEFAULT_REPEAT = 3
+
+FULL_RANGE = (date.fromisoformat(START_DATE), date.fromisoformat(END_DATE))
+
+# Filter selections representative of dashboard use, from the default
+# view to narrow drill-downs that only the row-level path can answer.
+SCENARIOS = {
+    "default": {},
+    "last_quarter": {"date_range": (date(2025, 10, 1), FULL_RANGE[1])},
+    "two_facilities_one_year": {
+        "date_range": (date(2025, 1, 1), FULL_RANGE[1]),
+        "facilities": FACILITY_NAMES[:2],
+    },
+    "vendors_ppi": {"vendors": ["Medtronic", "Stryker"], "ppi_only": True},
+    "categories_off_contract": {
+        "categories": CATEGORIES[:2],
+        "contract_types": ["Off-Contract"],
+    },
+}
+
+
+def _measure(fn: Callable[[], Any], repeat: int) -> dict:
+    """Time ``fn`` and measure the peak memory it allocates.
+
+    Timings come from ``repeat`` untraced calls; peak memory from one
+    more call under ``tracemalloc``, which NumPy and pandas report
+    their buffers to.
+    """
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "seconds_min": min(times),
+        "seconds_median": statistics.median(times),
+        "peak_bytes": peak,
+    }
+
+
+def _max_rss_bytes() -> int | None:
+    """Return the process's peak resident set size, if available."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def run_size(csv_path: Path, repeat: int) -> list[dict]:
+    """Benchmark every stage over one dataset.
+
+    Must run in a process whose ``SPEND_DATA_PATH`` points at
+    ``csv_path``, so that ``load_data`` reads it.
+
+    Args:
+        csv_path: Generated dataset.
+        repeat: Timed calls per stage.
+
+    Returns:
+        One result record per stage and scenario.
+    """
+    from utils import charts
+    from utils.aggregations import AggregationContext
+    from utils.data_processing import (
+        apply_filters,
+        calculate_kpis,
+        calculate_period_kpis,
+        calculate_prior_period,
+        filter_positions,
+        load_data,
+    )
+    from utils.indexing import FilterIndex
+
+    chart_functions = {
+        name: getattr(charts, name)
+        for name in (
+            "spend_by_category",
+            "monthly_spend_trend",
+            "top_vendors_by_spend",
+            "vendor_treemap",
+            "spend_by_facility",
+            "facility_ppi_mix",
+            "contract_type_by_category",
+            "off_contract_opportunities",
+        )
+    }
+
+    results: list[dict] = []
+
+    def _record(
+        stage: str,
+        scenario: str,
+        fn: Callable[[], Any],
+        result_rows: int | None = None,
+    ) -> None:
+        results.append(
+            {
+                "stage": stage,
+                "scenario": scenario,
+                "result_rows": result_rows,
+                **_measure(fn, repeat),
+            }
+        )
+
+    def _load(use_cache: bool, compact: bool = False) -> pd.DataFrame:
+        load_data.clear()
+        return load_data(use_cache=use_cache, compact=compact)
+
+    _record("load_data_csv", "default", lambda: _load(use_cache=False))
+    _load(use_cache=True)
+    _record("load_data_cached", "default", lambda: _load(use_cache=True))
+    _load(use_cache=True, compact=True)
+    _record(
+        "load_data_compact",
+        "default",
+        lambda: _load(use_cache=True, compact=True),
+    )
+    df = _load(use_cache=True)
+    n_rows = len(df)
+    _record("build_filter_index", "default", lambda: FilterIndex.build(df))
+    index = FilterIndex.build(df)
+
+    for scenario, filters in SCENARIOS.items():
+        filters = {"date_range": FULL_RANGE, **filters}
+        start, end = filters["date_range"]
+        filtered = apply_filters(df, **filters)
+        positions = filter_positions(df, index=index, **filters)
+        n_filtered = len(filtered)
+
+        _record(
+            "apply_filters",
+            scenario,
+            lambda: apply_filters(df, **filters),
+            n_filtered,
+        )
+        _record(
+            "apply_filters_indexed",
+            scenario,
+            lambda: apply_filters(df, index=index, **filters),
+            n_filtered,
+        )
+        _record(
+            "calculate_kpis",
+            scenario,
+            lambda: calculate_kpis(filtered),
+            n_filtered,
+        )
+        _record(
+            "calculate_prior_period",
+            scenario,
+            lambda: calculate_prior_period(df, start, end, index=index),
+        )
+        _record(
+            "calculate_period_kpis",
+            scenario,
+            lambda: calculate_period_kpis(df, start, end, rows=positions),
+            n_filtered,
+        )
+        if filtered.empty:
+            continue
+        for name, chart in chart_functions.items():
+            _record(
+                f"chart:{name}",
+                scenario,
+                lambda chart=chart: chart(filtered),
+                n_filtered,
+            )
+
+        def _all_charts() -> None:
+            context = AggregationContext(filtered)
+            for chart in chart_functions.values():
+                chart(context)
+
+        _record("charts_shared_context", scenario, _all_charts, n_filtered)
+
+    for record in results:
+        record["rows"] = n_rows
+    results.append(
+        {
+            "stage": "process",
+            "scenario": "default",
+            "rows": n_rows,
+            "max_rss_bytes": _max_rss_bytes(),
+        }
+    )
+    return results
+
+
+def ensure_dataset(data_dir: Path, n_rows: int, seed: int) -> Path:
+    """Generate the dataset for ``n_rows`` unless it already exists.
+
+    Returns:
+        Path of the dataset's CSV. Each size gets its own directory so
+        that its Parquet cache sits alongside it.
+    """
+    csv_path = data_dir / f"rows-{n_rows}-seed-{seed}" / "spend.csv"
+    if csv_path.exists():
+        return csv_path
+    csv_path.parent.mkdir(parents=True, exist_ok=True)
+    print(f"Generating {n_rows:,} rows -> {csv_path}", file=sys.stderr)
+    df = generate_data_parallel(n_rows, seed=seed)
+    tmp_path = csv_path.with_suffix(".csv.tmp")
+    df.to_csv(tmp_path, index=False)
+    tmp_path.replace(csv_path)
+    return csv_path
+
+
+def _run_in_subprocess(csv_path: Path, repeat: int) -> list[dict]:
+    """Run ``run_size`` in a fresh interpreter pointed at ``csv_path``."""
+    completed = subprocess.run(
+        [
+            sys.executable,
+            str(Path(__file__).resolve()),
+            "--run-dataset",
+            str(csv_path),
+            "--repeat",
+            str(repeat),
+        ],
+        env={**os.environ, "SPEND_DATA_PATH": str(csv_path)},
+        stdout=subprocess.PIPE,
+        check=True,
+        text=True,
+    )
+    return json.loads(completed.stdout)
+
+
+def _git_commit() -> str | None:
+    """Return the current commit hash, or None outside a checkout."""
+    try:
+        completed = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=Path(__file__).parent,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            check=True,
+            text=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return completed.stdout.strip()
+
+
+def _metadata(repeat: int, seed: int) -> dict:
+    """Describe the environment a run was measured in."""
+    return {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "repeat": repeat,
+        "seed": seed,
+    }
+
+
+def _key(record: dict) -> tuple:
+    return record["rows"], record["scenario"], record["stage"]
+
+
+def compare(
+    baseline: dict,
+    current: dict,
+    max_slowdown: float,
+    max_memory_growth: float,
+    min_seconds: float,
+    min_bytes: int,
+) -> list[str]:
+    """List the stages of ``current`` that regressed from ``baseline``.
+
+    Stages are matched on (rows, scenario, stage) and compared on
+    their fastest time and peak memory. Stages below ``min_seconds``
+    or ``min_bytes`` in both runs are too small to compare reliably.
+
+    Args:
+        baseline: Results document of the reference run.
+        current: Results document of the run being checked.
+        max_slowdown: Largest allowed ratio of current to baseline
+            time.
+        max_memory_growth: Largest allowed ratio of current to
+            baseline peak memory.
+        min_seconds: Time below which a stage is not compared.
+        min_bytes: Peak memory below which a stage is not compared.
+
+    Returns:
+        One message per regression; empty if there are none.
+    """
+    reference = {
+        _key(record): record
+        for record in baseline["results"]
+        if "seconds_min" in record
+    }
+    regressions = []
+    for record in current["results"]:
+        old = reference.get(_key(record))
+        if old is None or "seconds_min" not in record:
+            continue
+        rows, scenario, stage = _key(record)
+        label = f"{stage} [{scenario}, {rows:,} rows]"
+        for field, limit, floor in (
+            ("seconds_min", max_slowdown, min_seconds),
+            ("peak_bytes", max_memory_growth, min_bytes),
+        ):
+            before, after = old[field], record[field]
+            if max(before, after) < floor:
+                continue
+            if after > max(before, floor) * limit:
+                regressions.append(
+                    f"{label}: {field} {before:.6g} -> {after:.6g} "
+                    f"({after / max(before, floor):.2f}x)"
+                )
+    return regressions
+
+
+def _print_table(document: dict) -> None:
+    """Print the timed stages of a results document."""
+    print(
+        f"{'rows':>11}  {'scenario':<24} {'stage':<40} "
+        f"{'min s':>9} {'peak MB':>9}"
+    )
+    for record in document["results"]:
+        if "seconds_min" not in record:
+            continue
+        print(
+            f"{record['rows']:>11,}  {record['scenario']:<24} "
+            f"{record['stage']:<40} {record['seconds_min']:>9.4f} "
+            f"{record['peak_bytes'] / 2**20:>9.1f}"
+        )
+
+
+def main() -> None:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=DEFAULT_SIZES,
+        help="Dataset sizes in rows.",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=DEFAULT_REPEAT,
+        help="Timed calls per stage; the fastest is compared.",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=SEED, help="Dataset random seed."
+    )
+    parser.add_argument(
+        "--data-dir",
+        type=Path,
+        default=DEFAULT_DATA_DIR,
+        help="Directory the generated datasets are kept in.",
+    )
+    parser.add_argument(
+        "--output", type=Path, default=None, help="Write results here."
+    )
+    parser.add_argument(
+        "--results",
+        type=Path,
+        default=None,
+        help="Check this existing results file instead of running.",
+    )
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        default=None,
+        help="Fail if any stage regressed from this results file.",
+    )
+    parser.add_argument(
+        "--max-slowdown",
+        type=float,
+        default=1.25,
+        help="Allowed ratio of current to baseline time.",
+    )
+    parser.add_argument(
+        "--max-memory-growth",
+        type=float,
+        default=1.25,
+        help="Allowed ratio of current to baseline peak memory.",
+    )
+    parser.add_argument(
+        "--min-seconds",
+        type=float,
+        default=0.005,
+        help="Stages faster than this in both runs are not compared.",
+    )
+    parser.add_argument(
+        "--min-mb",
+        type=float,
+        default=1.0,
+        help="Stages allocating less than this in both runs are not "
+        "compared.",
+    )
+    parser.add_argument(
+        "--run-dataset", type=Path, default=None, help=argparse.SUPPRESS
+    )
+    args = parser.parse_args()
+
+    if args.run_dataset is not None:
+        logging.getLogger("streamlit").setLevel(logging.ERROR)
+        json.dump(run_size(args.run_dataset, args.repeat), sys.stdout)
+        return
+
+    if args.results is not None:
+        document = json.loads(args.results.read_text())
+    else:
+        results = []
+        for n_rows in args.sizes:
+            csv_path = ensure_dataset(args.data_dir, n_rows, args.seed)
+            print(f"Benchmarking {n_rows:,} rows", file=sys.stderr)
+            results += _run_in_subprocess(csv_path, args.repeat)
+        document = {
+            "metadata": _metadata(args.repeat, args.seed),
+            "results": results,
+        }
+    if args.output is not None:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(document, indent=2))
+    _print_table(document)
+
+    if args.baseline is not None:
+        regressions = compare(
+            json.loads(args.baseline.read_text()),
+            document,
+            max_slowdown=args.max_slowdown,
+            max_memory_growth=args.max_memory_growth,
+            min_seconds=args.min_seconds,
+            min_bytes=int(args.min_mb * 2**20),
+        )
+        if regressions:
+            print(f"\n{len(regressions)} regression(s):")
+            for message in regressions:
+                print(f"  {message}")
+            sys.exit(1)
+        print("\nNo regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
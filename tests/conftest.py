@@ -0,0 +1,69 @@
+"""Shared fixtures: a small generated spend dataset in both schemas."""
+from __future__ import annotations
+
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from generate_data import generate_data_vectorized
+from utils import data_processing, ingest, sql_backend
+from utils.data_processing import compact_schema, prepare_rows
+
+N_ROWS = 6000
+SEED = 7
+
+
+@pytest.fixture(scope="session")
+def data_csv(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    """Generated spend CSV, written once per session."""
+    path = tmp_path_factory.mktemp("data") / "healthcare_spend.csv"
+    generate_data_vectorized(N_ROWS, seed=SEED).to_csv(path, index=False)
+    return path
+
+
+@pytest.fixture(scope="session")
+def spend_df(data_csv: Path) -> pd.DataFrame:
+    """Typed frame, as the loader returns it. Do not modify."""
+    return prepare_rows(
+        pd.read_csv(data_csv, parse_dates=["transaction_date"])
+    )
+
+
+@pytest.fixture(scope="session")
+def compact_df(spend_df: pd.DataFrame) -> pd.DataFrame:
+    """The same rows in the compact schema. Do not modify."""
+    return compact_schema(spend_df)
+
+
+@pytest.fixture(params=["typed", "compact"])
+def frame(
+    request: pytest.FixtureRequest,
+    spend_df: pd.DataFrame,
+    compact_df: pd.DataFrame,
+) -> pd.DataFrame:
+    """Each schema in turn; rows are in the order of ``spend_df``."""
+    return spend_df if request.param == "typed" else compact_df
+
+
+@pytest.fixture
+def data_path(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> Path:
+    """Point every loader at an empty data directory under ``tmp_path``.
+
+    Returns:
+        Path of the CSV the loaders read; the test writes it.
+    """
+    path = tmp_path / "healthcare_spend.csv"
+    paths = {
+        "DATA_PATH": path,
+        "PARTITIONED_PATH": tmp_path / "partitioned",
+        "CACHE_DIR": tmp_path / ".cache",
+    }
+    for module in (data_processing, ingest, sql_backend):
+        for name, value in paths.items():
+            if hasattr(module, name):
+                monkeypatch.setattr(module, name, value)
+    data_processing.load_data.clear()
+    return path
@@ -0,0 +1,172 @@
+"""Reference implementations the fast paths are checked against.
+
+``apply_filters``, ``calculate_kpis`` and ``calculate_prior_period``
+are the original pandas versions from before any index, cube or
+sketch existed; they are slow but obviously correct.
+"""
+from __future__ import annotations
+
+from datetime import date, timedelta
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def apply_filters(
+    df: pd.DataFrame,
+    date_range: Optional[tuple[date, date]] = None,
+    facilities: Optional[list[str]] = None,
+    categories: Optional[list[str]] = None,
+    vendors: Optional[list[str]] = None,
+    contract_types: Optional[list[str]] = None,
+    ppi_only: bool = False,
+) -> pd.DataFrame:
+    """Apply sidebar filter selections to the DataFrame."""
+    filtered = df.copy()
+
+    if date_range is not None:
+        start, end = date_range
+        filtered = filtered[
+            (filtered["transaction_date"].dt.date >= start)
+            & (filtered["transaction_date"].dt.date <= end)
+        ]
+
+    if facilities:
+        filtered = filtered[
+            filtered["facility_name"].isin(facilities)
+        ]
+
+    if categories:
+        filtered = filtered[
+            filtered["spend_category"].isin(categories)
+        ]
+
+    if vendors:
+        filtered = filtered[
+            filtered["vendor_name"].isin(vendors)
+        ]
+
+    if contract_types:
+        filtered = filtered[
+            filtered["contract_type"].isin(contract_types)
+        ]
+
+    if ppi_only:
+        filtered = filtered[filtered["ppi_flag"]]
+
+    return filtered
+
+
+def calculate_kpis(df: pd.DataFrame) -> dict:
+    """Calculate all KPI values from filtered data."""
+    total_spend = df["total_amount"].sum()
+    transaction_count = len(df)
+    unique_vendors = df["vendor_name"].nunique()
+
+    ppi_spend = df.loc[df["ppi_flag"], "total_amount"].sum()
+    ppi_spend_pct = (
+        (ppi_spend / total_spend * 100) if total_spend > 0 else 0.0
+    )
+
+    avg_transaction = (
+        total_spend / transaction_count
+        if transaction_count > 0
+        else 0.0
+    )
+
+    return {
+        "total_spend": total_spend,
+        "transaction_count": transaction_count,
+        "unique_vendors": unique_vendors,
+        "ppi_spend_pct": ppi_spend_pct,
+        "avg_transaction": avg_transaction,
+    }
+
+
+def calculate_prior_period(
+    df_full: pd.DataFrame,
+    current_start: date,
+    current_end: date,
+) -> dict:
+    """Calculate prior period KPIs for delta comparison."""
+    current_start_ts = pd.Timestamp(current_start)
+    current_end_ts = pd.Timestamp(current_end)
+    duration = current_end_ts - current_start_ts
+
+    prior_end = current_start_ts - pd.Timedelta(days=1)
+    prior_start = prior_end - duration
+
+    prior_df = df_full[
+        (df_full["transaction_date"] >= prior_start)
+        & (df_full["transaction_date"] <= prior_end)
+    ]
+
+    return calculate_kpis(prior_df)
+
+
+def random_selection(
+    rng: np.random.Generator,
+    df: pd.DataFrame,
+    dimensions: tuple[str, ...] = (
+        "facilities",
+        "categories",
+        "vendors",
+        "contract_types",
+        "ppi_only",
+    ),
+) -> dict:
+    """Draw sidebar filter keyword arguments for ``df``.
+
+    Each dimension is left unset, set to every value, or set to a
+    random (possibly single-value) subset, and the date range may
+    start before or end after the data.
+
+    Args:
+        rng: Random generator.
+        df: Typed spend frame the values are drawn from.
+        dimensions: Filter arguments to draw besides ``date_range``.
+    """
+    columns = {
+        "facilities": "facility_name",
+        "categories": "spend_category",
+        "vendors": "vendor_name",
+        "contract_types": "contract_type",
+    }
+    first = df["transaction_date"].min().date()
+    last = df["transaction_date"].max().date()
+    span = (last - first).days
+    selection: dict = {}
+    if rng.random() < 0.9:
+        start = first + timedelta(days=int(rng.integers(-10, span)))
+        length = int(rng.integers(0, span // 2))
+        selection["date_range"] = (start, start + timedelta(days=length))
+    for name in dimensions:
+        if name == "ppi_only":
+            selection["ppi_only"] = bool(rng.random() < 0.3)
+            continue
+        values = sorted(df[columns[name]].unique())
+        draw = rng.random()
+        if draw < 0.3:
+            continue
+        if draw < 0.4:
+            selection[name] = values
+            continue
+        size = int(rng.integers(1, len(values) + 1))
+        chosen = rng.choice(len(values), size=size, replace=False)
+        selection[name] = [values[i] for i in sorted(chosen)]
+    return selection
+
+
+def assert_kpis_equal(
+    actual: dict, expected: dict, rel: float = 1e-9
+) -> None:
+    """Assert two KPI dictionaries agree, dollars up to ``rel``."""
+    assert actual.keys() == expected.keys()
+    assert actual["transaction_count"] == expected["transaction_count"]
+    assert actual["unique_vendors"] == expected["unique_vendors"]
+    for key in ("total_spend", "ppi_spend_pct", "avg_transaction"):
+        assert actual[key] == pytest.approx(
+            expected[key], rel=rel, abs=1e-6
+        ), key
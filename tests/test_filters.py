@@ -0,0 +1,90 @@
+"""Filter fast paths against the original pandas ``apply_filters``."""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tests import reference
+from utils.data_processing import apply_filters, filter_positions
+from utils.indexing import DimensionMasks, FilterIndex, FilterStats
+
+N_SELECTIONS = 40
+
+
+def _selections(df: pd.DataFrame, seed: int) -> list[dict]:
+    rng = np.random.default_rng(seed)
+    return [
+        reference.random_selection(rng, df) for _ in range(N_SELECTIONS)
+    ]
+
+
+def _positions(rows: slice | np.ndarray, n_rows: int) -> np.ndarray:
+    if isinstance(rows, slice):
+        return np.arange(*rows.indices(n_rows))
+    return np.asarray(rows)
+
+
+def _expected(spend_df: pd.DataFrame, selection: dict) -> np.ndarray:
+    return reference.apply_filters(spend_df, **selection).index.to_numpy()
+
+
+def test_index_rows_match_baseline(frame, spend_df):
+    index = FilterIndex.build(frame)
+    for selection in _selections(spend_df, seed=1):
+        rows = index.rows(**selection)
+        np.testing.assert_array_equal(
+            _positions(rows, len(frame)),
+            _expected(spend_df, selection),
+            err_msg=str(selection),
+        )
+
+
+@pytest.mark.parametrize("indexed", [False, True])
+@pytest.mark.parametrize("planned", [False, True])
+def test_apply_filters_matches_baseline(frame, spend_df, indexed, planned):
+    index = FilterIndex.build(frame) if indexed else None
+    stats = FilterStats.build(frame) if planned else None
+    for selection in _selections(spend_df, seed=2):
+        filtered = apply_filters(frame, index=index, stats=stats, **selection)
+        expected = reference.apply_filters(frame, **selection)
+        pd.testing.assert_frame_equal(filtered, expected)
+
+
+def test_dimension_masks_match_baseline(frame, spend_df):
+    masks = DimensionMasks(FilterIndex.build(frame))
+    rng = np.random.default_rng(3)
+    selection = reference.random_selection(rng, spend_df)
+    for _ in range(N_SELECTIONS):
+        # Change one widget at a time, as sidebar reruns do.
+        changed = reference.random_selection(rng, spend_df)
+        key = rng.choice(sorted(set(changed) | {"date_range"}))
+        selection = {k: v for k, v in selection.items() if k != key}
+        if key in changed:
+            selection[key] = changed[key]
+        rows = masks.rows(**selection)
+        np.testing.assert_array_equal(
+            _positions(rows, len(frame)),
+            _expected(spend_df, selection),
+            err_msg=str(selection),
+        )
+
+
+def test_unsorted_frame_falls_back_to_masks(spend_df):
+    shuffled = spend_df.sample(frac=1.0, random_state=0)
+    shuffled = shuffled.reset_index(drop=True)
+    for selection in _selections(spend_df, seed=4):
+        rows = filter_positions(shuffled, **selection)
+        expected = reference.apply_filters(shuffled, **selection)
+        np.testing.assert_array_equal(
+            _positions(rows, len(shuffled)), expected.index.to_numpy()
+        )
+
+
+def test_index_for_other_frame_is_ignored(spend_df):
+    index = FilterIndex.build(spend_df.iloc[:100])
+    selection = {"facilities": sorted(spend_df["facility_name"].unique())[:2]}
+    filtered = apply_filters(spend_df, index=index, **selection)
+    pd.testing.assert_frame_equal(
+        filtered, reference.apply_filters(spend_df, **selection)
+    )
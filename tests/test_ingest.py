@@ -0,0 +1,289 @@
+"""Incremental appends against rebuilding everything from scratch."""
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tests import reference
+from utils.buffers import AppendBuffer, FrameBuffer
+from utils.cube import CUBE_DIMENSIONS, CUBE_MEASURES
+from utils.data_processing import compact_schema, take_rows
+from utils.indexing import FilterIndex, SortIndex
+from utils.ingest import SpendSnapshot, SpendStore
+
+N_SELECTIONS = 25
+SORT_COLUMNS = [
+    "transaction_date",
+    "transaction_id",
+    "facility_name",
+    "vendor_name",
+    "unit_price",
+    "quantity",
+    "total_amount",
+]
+
+
+def _decoded(df: pd.DataFrame) -> pd.DataFrame:
+    """Return ``df`` with categoricals as their values' dtype.
+
+    Appending puts new categories after the existing ones, so the
+    category order can differ from a frame encoded in one go.
+    """
+    return df.assign(
+        **{
+            col: df[col].astype(df[col].cat.categories.dtype)
+            for col in df.columns
+            if isinstance(df[col].dtype, pd.CategoricalDtype)
+        }
+    )
+
+
+def _positions(rows: slice | np.ndarray, n_rows: int) -> np.ndarray:
+    if isinstance(rows, slice):
+        return np.arange(*rows.indices(n_rows))
+    return np.asarray(rows)
+
+
+def _grouped_cube(cube: pd.DataFrame) -> pd.DataFrame:
+    """Sum cube cells a batch boundary split into duplicates."""
+    return (
+        _decoded(cube)
+        .groupby(CUBE_DIMENSIONS, sort=True)[CUBE_MEASURES]
+        .sum()
+        .reset_index()
+    )
+
+
+def assert_snapshots_equal(
+    snapshot: SpendSnapshot, rebuilt: SpendSnapshot, seed: int = 0
+) -> None:
+    """Assert an appended snapshot answers like a rebuilt one."""
+    df = rebuilt.df
+    pd.testing.assert_frame_equal(_decoded(snapshot.df), _decoded(df))
+    pd.testing.assert_frame_equal(
+        _grouped_cube(snapshot.cube), _grouped_cube(rebuilt.cube)
+    )
+
+    sketches = rebuilt.vendor_sketches
+    rng = np.random.default_rng(seed)
+    for _ in range(N_SELECTIONS):
+        selection = reference.random_selection(rng, _decoded(df))
+        np.testing.assert_array_equal(
+            _positions(snapshot.filter_index.rows(**selection), len(df)),
+            _positions(rebuilt.filter_index.rows(**selection), len(df)),
+        )
+        cells = take_rows(
+            snapshot.cube, snapshot.cube_index.rows(**selection)
+        )
+        expected = reference.apply_filters(df, **selection)
+        assert cells["transaction_count"].sum() == len(expected)
+        assert cells["total_amount"].sum() == pytest.approx(
+            expected["total_amount"].astype(np.float64).sum()
+        )
+
+        if "date_range" not in selection:
+            continue
+        start, end = selection["date_range"]
+        sliced = {
+            key: selection.get(key) for key in ("facilities", "categories")
+        }
+        actual = snapshot.prefix_sums.totals(start, end, **sliced)
+        for key, value in rebuilt.prefix_sums.totals(
+            start, end, **sliced
+        ).items():
+            assert actual[key] == pytest.approx(value), key
+        assert snapshot.prefix_sums.distinct_vendors(
+            start, end
+        ) == rebuilt.prefix_sums.distinct_vendors(start, end)
+        assert snapshot.vendor_sketches.count(
+            start, end, **sliced
+        ) == sketches.count(start, end, **sliced)
+
+    for column in SORT_COLUMNS:
+        np.testing.assert_array_equal(
+            snapshot.sort_index.order(column),
+            rebuilt.sort_index.order(column),
+            err_msg=column,
+        )
+
+
+def _split(frame: pd.DataFrame, seed: int, n_batches: int) -> list[int]:
+    """Return batch boundaries, at least one of them inside a day."""
+    rng = np.random.default_rng(seed)
+    bounds = sorted(rng.choice(np.arange(1, len(frame)), n_batches, False))
+    dates = frame["transaction_date"]
+    assert any(dates.iloc[b - 1] == dates.iloc[b] for b in bounds)
+    return [0, *bounds, len(frame)]
+
+
+def test_appends_match_rebuild(frame):
+    bounds = _split(frame, seed=20, n_batches=4)
+    snapshot = SpendSnapshot.build(frame.iloc[: bounds[1]])
+    for lo, hi in zip(bounds[1:], bounds[2:]):
+        # Sort the rows already loaded, so the merge path is taken.
+        for column in SORT_COLUMNS:
+            snapshot.sort_index.order(column)
+        snapshot = snapshot.append(frame.iloc[lo:hi])
+    assert snapshot.version == len(bounds) - 2
+    assert_snapshots_equal(snapshot, SpendSnapshot.build(frame))
+
+
+def test_append_adds_new_values(spend_df):
+    base = compact_schema(spend_df.iloc[:4000])
+    delta = spend_df.iloc[4000:].assign(
+        facility_name=lambda d: d["facility_name"].where(
+            d.index % 3 > 0, "Lakeside Surgical Center"
+        ),
+        vendor_name=lambda d: d["vendor_name"].where(
+            d.index % 5 > 0, "Acme Ortho"
+        ),
+    )
+    dictionary = {
+        col: base[col].dtype
+        for col in ("facility_name", "vendor_name", "spend_category")
+    }
+    # Encode the batch like SpendStore does: new dimension values
+    # after the existing ones, numbers in the loaded dtypes.
+    encoded = compact_schema(delta, dictionary).assign(
+        **{
+            col: delta[col].astype(base[col].dtype)
+            for col in ("unit_price", "quantity", "total_amount")
+        }
+    )
+    snapshot = SpendSnapshot.build(base).append(encoded)
+    whole = pd.concat([spend_df.iloc[:4000], delta], ignore_index=True)
+    assert_snapshots_equal(
+        snapshot, SpendSnapshot.build(compact_schema(whole)), seed=1
+    )
+    assert "Lakeside Surgical Center" in snapshot.prefix_sums.facilities
+
+
+def test_back_dated_rows_rebuild(spend_df):
+    snapshot = SpendSnapshot.build(spend_df.iloc[3000:])
+    appended = snapshot.append(spend_df.iloc[:3000])
+    assert appended.version == 1
+    # Rows of the day both parts share keep their appended order.
+    rows = pd.concat([spend_df.iloc[3000:], spend_df.iloc[:3000]])
+    rows = rows.sort_values("transaction_date", kind="stable")
+    assert_snapshots_equal(
+        appended,
+        SpendSnapshot.build(rows.reset_index(drop=True)),
+        seed=2,
+    )
+
+
+def test_older_snapshots_are_unchanged(frame):
+    base = SpendSnapshot.build(frame.iloc[:3000])
+    before = _decoded(base.df.copy())
+    before_rows = base.filter_index.rows(ppi_only=True)
+    first = base.append(frame.iloc[3000:4500])
+    # Appending to ``base`` again must not overwrite what ``first``
+    # wrote into the shared buffers.
+    second = base.append(frame.iloc[4500:])
+
+    pd.testing.assert_frame_equal(_decoded(base.df), before)
+    np.testing.assert_array_equal(
+        _positions(base.filter_index.rows(ppi_only=True), 3000),
+        _positions(before_rows, 3000),
+    )
+    assert_snapshots_equal(
+        first, SpendSnapshot.build(frame.iloc[:4500]), seed=3
+    )
+    whole = pd.concat([frame.iloc[:3000], frame.iloc[4500:]])
+    assert_snapshots_equal(
+        second,
+        SpendSnapshot.build(whole.reset_index(drop=True)),
+        seed=4,
+    )
+
+
+def test_filter_index_append_matches_build(frame):
+    index = FilterIndex.build(frame.iloc[:10])
+    for lo, hi in [(10, 11), (11, 500), (500, 503), (503, len(frame))]:
+        index = index.append(frame.iloc[lo:hi])
+    rebuilt = FilterIndex.build(frame)
+    assert index.n_rows == rebuilt.n_rows
+    np.testing.assert_array_equal(index.days, rebuilt.days)
+    for column, by_value in rebuilt.bitmaps.items():
+        for value, bitmap in by_value.items():
+            np.testing.assert_array_equal(
+                index.bitmaps[column][value], bitmap, err_msg=str(value)
+            )
+
+
+def test_sort_index_merge_matches_argsort(frame):
+    n = len(frame) // 2
+    index = SortIndex(frame.iloc[:n])
+    for column in SORT_COLUMNS:
+        index.order(column)
+    merged = index.append(frame)
+    for column in SORT_COLUMNS:
+        np.testing.assert_array_equal(
+            merged.order(column), SortIndex(frame).order(column)
+        )
+
+
+def test_append_buffer_versions():
+    buffer = AppendBuffer(np.arange(3))
+    grown = buffer.extend(3, np.arange(3, 100))
+    assert grown is buffer
+    np.testing.assert_array_equal(buffer.view(3), [0, 1, 2])
+
+    # Extending the older three-item version copies it.
+    branch = buffer.extend(3, np.array([-1]))
+    assert branch is not buffer
+    np.testing.assert_array_equal(branch.view(), [0, 1, 2, -1])
+    np.testing.assert_array_equal(buffer.view(), np.arange(100))
+
+
+def test_frame_buffer_versions(frame):
+    buffer = FrameBuffer.from_frame(frame.iloc[:100])
+    newer = buffer.append(frame.iloc[100:200].reset_index(drop=True))
+    branch = buffer.append(frame.iloc[300:400].reset_index(drop=True))
+    pd.testing.assert_frame_equal(buffer.frame, frame.iloc[:100])
+    pd.testing.assert_frame_equal(newer.frame, frame.iloc[:200])
+    pd.testing.assert_frame_equal(
+        branch.frame,
+        pd.concat([frame.iloc[:100], frame.iloc[300:400]], ignore_index=True),
+    )
+    with pytest.raises(ValueError):
+        buffer.frame["total_amount"].to_numpy()[0] = 0.0
+
+
+def _write_lines(path: Path, lines: list[bytes], mode: str = "wb") -> None:
+    with path.open(mode) as fh:
+        fh.writelines(lines)
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_store_refresh_appends_new_lines(data_csv, data_path, compact):
+    lines = data_csv.read_bytes().splitlines(keepends=True)
+    header, rows = lines[0], lines[1:]
+    _write_lines(data_path, [header, *rows[:4000]])
+    store = SpendStore(compact=compact, refresh_seconds=0)
+    assert len(store.snapshot.df) == 4000
+
+    # A partly written last line is left for the next refresh.
+    _write_lines(data_path, [*rows[4000:5000], rows[5000][:10]], "ab")
+    assert store.refresh(force=True) == 1000
+    _write_lines(data_path, [rows[5000][10:], *rows[5001:]], "ab")
+    assert store.refresh(force=True) == len(rows) - 5000
+    assert store.snapshot.version == 2
+
+    store.snapshot.sort_index.order("vendor_name")
+    rebuilt = SpendStore(compact=compact, refresh_seconds=0)
+    assert_snapshots_equal(store.snapshot, rebuilt.snapshot, seed=5)
+
+
+def test_store_reloads_rewritten_file(data_csv, data_path):
+    lines = data_csv.read_bytes().splitlines(keepends=True)
+    _write_lines(data_path, lines[:3001])
+    store = SpendStore(refresh_seconds=0)
+    _write_lines(data_path, [lines[0], *lines[3001:]])
+    assert store.refresh(force=True) == len(lines) - 3001
+    assert store.snapshot.version == 1
+    first_id = lines[3001].split(b",")[0].decode()
+    assert store.snapshot.df["transaction_id"].iloc[0] == first_id
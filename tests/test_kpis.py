@@ -0,0 +1,138 @@
+"""KPI fast paths against the original pandas KPI functions."""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tests import reference
+from utils.cube import PrefixSums, build_cube
+from utils.data_processing import (
+    apply_filters,
+    calculate_kpis,
+    calculate_period_kpis,
+    calculate_prior_period,
+    calculate_range_kpis,
+    take_rows,
+)
+from utils.indexing import FilterIndex
+
+N_SELECTIONS = 40
+
+# float32 dollars of the compact schema are summed in float64 but
+# differ from the typed values by up to half a cent each.
+REL = 1e-6
+
+
+def _dated_selections(
+    df: pd.DataFrame, seed: int, **kwargs
+) -> list[dict]:
+    """Random selections that all set ``date_range``."""
+    rng = np.random.default_rng(seed)
+    selections = []
+    while len(selections) < N_SELECTIONS:
+        selection = reference.random_selection(rng, df, **kwargs)
+        if "date_range" in selection:
+            selections.append(selection)
+    return selections
+
+
+@pytest.fixture
+def cube(frame: pd.DataFrame) -> pd.DataFrame:
+    return build_cube(frame)
+
+
+def test_calculate_kpis_matches_baseline(frame, spend_df):
+    rng = np.random.default_rng(10)
+    for _ in range(N_SELECTIONS):
+        selection = reference.random_selection(rng, spend_df)
+        reference.assert_kpis_equal(
+            calculate_kpis(apply_filters(frame, **selection)),
+            reference.calculate_kpis(
+                reference.apply_filters(spend_df, **selection)
+            ),
+            rel=REL,
+        )
+
+
+def test_cube_kpis_match_baseline(cube, spend_df):
+    index = FilterIndex.build(cube)
+    rng = np.random.default_rng(11)
+    for _ in range(N_SELECTIONS):
+        selection = reference.random_selection(rng, spend_df)
+        reference.assert_kpis_equal(
+            calculate_kpis(take_rows(cube, index.rows(**selection))),
+            reference.calculate_kpis(
+                reference.apply_filters(spend_df, **selection)
+            ),
+            rel=REL,
+        )
+
+
+@pytest.mark.parametrize("level", ["transactions", "cube"])
+def test_period_kpis_match_baseline(frame, cube, spend_df, level):
+    full = frame if level == "transactions" else cube
+    index = FilterIndex.build(full)
+    for selection in _dated_selections(spend_df, seed=12):
+        start, end = selection["date_range"]
+        current, prior = calculate_period_kpis(
+            full, start, end, rows=index.rows(**selection)
+        )
+        reference.assert_kpis_equal(
+            current,
+            reference.calculate_kpis(
+                reference.apply_filters(spend_df, **selection)
+            ),
+            rel=REL,
+        )
+        reference.assert_kpis_equal(
+            prior,
+            reference.calculate_prior_period(spend_df, start, end),
+            rel=REL,
+        )
+
+
+def test_range_kpis_match_baseline(frame, cube, spend_df):
+    prefix_sums = PrefixSums.build(cube)
+    selections = _dated_selections(
+        spend_df, seed=13, dimensions=("facilities", "categories")
+    )
+    for selection in selections:
+        start, end = selection.pop("date_range")
+        filtered = apply_filters(frame, date_range=(start, end), **selection)
+        reference.assert_kpis_equal(
+            calculate_range_kpis(
+                prefix_sums, start, end, df=filtered, **selection
+            ),
+            reference.calculate_kpis(
+                reference.apply_filters(
+                    spend_df, date_range=(start, end), **selection
+                )
+            ),
+            rel=REL,
+        )
+
+
+def test_range_kpis_require_rows_for_a_slice(cube, spend_df):
+    prefix_sums = PrefixSums.build(cube)
+    first = spend_df["transaction_date"].min().date()
+    with pytest.raises(ValueError):
+        calculate_range_kpis(
+            prefix_sums, first, first, facilities=prefix_sums.facilities[:1]
+        )
+
+
+@pytest.mark.parametrize("source", ["rows", "index", "prefix_sums"])
+def test_prior_period_matches_baseline(frame, cube, spend_df, source):
+    kwargs = {}
+    if source == "index":
+        kwargs["index"] = FilterIndex.build(frame)
+    elif source == "prefix_sums":
+        kwargs["prefix_sums"] = PrefixSums.build(cube)
+    for selection in _dated_selections(spend_df, seed=14, dimensions=()):
+        start, end = selection["date_range"]
+        reference.assert_kpis_equal(
+            calculate_prior_period(frame, start, end, **kwargs),
+            reference.calculate_prior_period(spend_df, start, end),
+            rel=REL,
+        )
@@ -0,0 +1,126 @@
+"""HyperLogLog vendor sketches against exact distinct counts."""
+from __future__ import annotations
+
+from datetime import date, timedelta
+from math import sqrt
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tests import reference
+from utils.sketches import MAX_PRECISION, DistinctSketches
+
+FIRST_DAY = date(2024, 1, 1)
+
+
+def _values_frame(n_values: int, n_rows: int, seed: int) -> pd.DataFrame:
+    """Rows over 60 days and 3 x 2 slices holding ``n_values`` ids."""
+    rng = np.random.default_rng(seed)
+    ids = np.concatenate(
+        [np.arange(n_values), rng.integers(0, n_values, n_rows)]
+    )
+    days = np.sort(rng.integers(0, 60, len(ids)))
+    return pd.DataFrame(
+        {
+            "transaction_date": pd.Timestamp(FIRST_DAY)
+            + pd.to_timedelta(days, unit="D"),
+            "facility_name": rng.choice(["A", "B", "C"], len(ids)),
+            "spend_category": rng.choice(["X", "Y"], len(ids)),
+            "item": [f"item-{i}" for i in rng.permutation(ids)],
+        }
+    )
+
+
+def _error_bound(precision: int) -> float:
+    """Four standard errors of a ``2 ** precision`` register sketch."""
+    return 4 * 1.04 / sqrt(2**precision)
+
+
+@pytest.mark.parametrize("n_values", [200, 1_000, 10_000, 50_000])
+@pytest.mark.parametrize("precision", [6, 8, 10])
+def test_estimate_within_error_bound(n_values, precision):
+    df = _values_frame(n_values, n_values, seed=n_values)
+    sketches = DistinctSketches.build(df, column="item", precision=precision)
+    last = FIRST_DAY + timedelta(days=59)
+    estimate = sketches.count(FIRST_DAY, last)
+    assert abs(estimate - n_values) <= _error_bound(precision) * n_values
+
+
+@pytest.mark.parametrize("n_values", [1, 5, 20, 60])
+def test_small_counts_are_near_exact(n_values):
+    df = _values_frame(n_values, 500, seed=n_values)
+    sketches = DistinctSketches.build(df, column="item")
+    last = FIRST_DAY + timedelta(days=59)
+    error = abs(sketches.count(FIRST_DAY, last) - n_values)
+    assert error <= max(1, 0.05 * n_values)
+
+
+def test_slices_within_error_bound():
+    df = _values_frame(20_000, 20_000, seed=1)
+    sketches = DistinctSketches.build(df, column="item")
+    rng = np.random.default_rng(40)
+    for _ in range(30):
+        start = FIRST_DAY + timedelta(days=int(rng.integers(0, 60)))
+        end = start + timedelta(days=int(rng.integers(0, 30)))
+        facilities = list(rng.choice(["A", "B", "C"], 2, replace=False))
+        categories = ["X"] if rng.random() < 0.5 else None
+        selected = reference.apply_filters(
+            df,
+            date_range=(start, end),
+            facilities=facilities,
+            categories=categories,
+        )
+        exact = selected["item"].nunique()
+        estimate = sketches.count(start, end, facilities, categories)
+        assert abs(estimate - exact) <= max(
+            _error_bound(10) * exact, 1
+        ), (start, end, facilities, categories)
+
+
+def test_vendor_counts_match_baseline(frame, spend_df):
+    sketches = DistinctSketches.build(frame)
+    rng = np.random.default_rng(41)
+    for _ in range(40):
+        selection = reference.random_selection(
+            rng, spend_df, dimensions=("facilities", "categories")
+        )
+        if "date_range" not in selection:
+            continue
+        start, end = selection["date_range"]
+        exact = reference.calculate_kpis(
+            reference.apply_filters(spend_df, **selection)
+        )["unique_vendors"]
+        estimate = sketches.count(
+            start,
+            end,
+            selection.get("facilities"),
+            selection.get("categories"),
+        )
+        assert abs(estimate - exact) <= 1, selection
+
+
+def test_incremental_sketches_match_build(spend_df):
+    sketches = DistinctSketches.build(spend_df.iloc[:2500])
+    for lo, hi in [(2500, 2501), (2501, 4000), (4000, len(spend_df))]:
+        sketches = sketches.append(spend_df.iloc[lo:hi])
+    rebuilt = DistinctSketches.build(spend_df)
+    first = spend_df["transaction_date"].iloc[0].date()
+    last = spend_df["transaction_date"].iloc[-1].date()
+    for facilities in (None, sketches.facilities[:2]):
+        np.testing.assert_array_equal(
+            sketches.merged(first, last, facilities),
+            rebuilt.merged(first, last, facilities),
+        )
+
+
+def test_append_rejects_earlier_days(spend_df):
+    sketches = DistinctSketches.build(spend_df.iloc[3000:])
+    with pytest.raises(ValueError):
+        sketches.append(spend_df.iloc[:10])
+
+
+@pytest.mark.parametrize("precision", [3, MAX_PRECISION + 1])
+def test_precision_out_of_range(spend_df, precision):
+    with pytest.raises(ValueError):
+        DistinctSketches.build(spend_df, precision=precision)
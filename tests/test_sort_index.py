@@ -0,0 +1,74 @@
+"""Explorer sort orders and pages against a pandas stable sort."""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tests import reference
+from utils.data_processing import EXPECTED_COLUMNS
+from utils.indexing import FilterIndex, SortIndex, page_of
+
+
+def _expected_order(spend_df: pd.DataFrame, selection: dict, column: str):
+    selected = reference.apply_filters(spend_df, **selection)
+    return selected.sort_values(column, kind="stable").index.to_numpy()
+
+
+@pytest.mark.parametrize("column", EXPECTED_COLUMNS)
+def test_sorted_rows_match_stable_sort(frame, spend_df, column):
+    index, sort_index = FilterIndex.build(frame), SortIndex(frame)
+    rng = np.random.default_rng(50)
+    for _ in range(15):
+        selection = reference.random_selection(rng, spend_df)
+        np.testing.assert_array_equal(
+            sort_index.sorted_rows(column, index.rows(**selection)),
+            _expected_order(spend_df, selection, column),
+            err_msg=str(selection),
+        )
+
+
+def test_categories_sort_by_label(compact_df, spend_df):
+    vendors = compact_df["vendor_name"].cat.categories[::-1]
+    shuffled = compact_df.assign(
+        vendor_name=compact_df["vendor_name"].cat.reorder_categories(
+            vendors
+        )
+    )
+    np.testing.assert_array_equal(
+        SortIndex(shuffled).order("vendor_name"),
+        _expected_order(spend_df, {}, "vendor_name"),
+    )
+
+
+@pytest.mark.parametrize("descending", [False, True])
+def test_pages_cover_the_selection(spend_df, descending):
+    sort_index = SortIndex(spend_df)
+    rows = FilterIndex.build(spend_df).rows(ppi_only=True)
+    ordered = sort_index.sorted_rows("total_amount", rows)
+    expected = _expected_order(spend_df, {"ppi_only": True}, "total_amount")
+    if descending:
+        # Ties in reverse load order, like the SQL backend.
+        expected = expected[::-1]
+
+    pages = [
+        page_of(ordered, descending, offset, 100)
+        for offset in range(0, len(ordered), 100)
+    ]
+    np.testing.assert_array_equal(np.concatenate(pages), expected)
+    assert all(len(page) == 100 for page in pages[:-1])
+    assert len(page_of(ordered, descending, len(ordered), 100)) == 0
+    np.testing.assert_array_equal(
+        sort_index.page("total_amount", rows, descending, 200, 100),
+        pages[2],
+    )
+
+
+def test_full_selection_reuses_the_order(spend_df):
+    sort_index = SortIndex(spend_df)
+    order = sort_index.order("vendor_name")
+    assert sort_index.sorted_rows("vendor_name", slice(0, None)) is order
+    np.testing.assert_array_equal(
+        sort_index.sorted_rows("vendor_name", slice(10, 20)),
+        order[(order >= 10) & (order < 20)],
+    )
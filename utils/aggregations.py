@@ -0,0 +1,113 @@
+"""Shared, memoised spend aggregations for the chart functions."""
+from __future__ import annotations
+
+import pandas as pd
+
+
+BASE_KEYS = [
+    "month",
+    "facility_name",
+    "spend_category",
+    "vendor_name",
+    "contract_type",
+    "ppi_flag",
+]
+
+
+class AggregationContext:
+    """Spend totals over one filtered frame, grouped on demand.
+
+    The frame is scanned once, into spend per month x facility x
+    category x vendor x contract type x PPI. Every other grouping the
+    charts ask for is rolled up from that base table and memoised, so
+    building all charts for a rerun touches the rows a single time.
+
+    Args:
+        df: Filtered frame of transactions or cube cells.
+    """
+
+    def __init__(self, df: pd.DataFrame) -> None:
+        self._df = df
+        self._base: pd.DataFrame | None = None
+        self._groupings: dict[tuple[str, ...], pd.Series] = {}
+
+    @classmethod
+    def from_base(cls, base: pd.DataFrame) -> AggregationContext:
+        """Wrap a base table that was already grouped elsewhere.
+
+        Args:
+            base: Spend per ``BASE_KEYS`` combination, with the
+                columns of ``base``; e.g. computed by a SQL engine.
+
+        Returns:
+            AggregationContext whose rollups start from ``base``.
+        """
+        context = cls(base)
+        context._base = base
+        return context
+
+    @property
+    def empty(self) -> bool:
+        """Whether the underlying frame has no rows."""
+        return self._df.empty
+
+    @property
+    def base(self) -> pd.DataFrame:
+        """Spend per ``BASE_KEYS`` combination, built on first use."""
+        if self._base is None:
+            df = self._df
+            dates = df["transaction_date"].to_numpy()
+            months = dates.astype("datetime64[M]").astype(dates.dtype)
+            self._base = (
+                pd.DataFrame(
+                    {
+                        "month": months,
+                        **{key: df[key] for key in BASE_KEYS[1:]},
+                        "total_amount": df["total_amount"].astype(
+                            "float64"
+                        ),
+                    },
+                    index=df.index,
+                )
+                .groupby(BASE_KEYS, observed=True, sort=False)[
+                    "total_amount"
+                ]
+                .sum()
+                .reset_index()
+            )
+        return self._base
+
+    def spend_by(self, *keys: str) -> pd.Series:
+        """Return total spend grouped by ``keys``, sorted by key.
+
+        Args:
+            keys: One or more of ``BASE_KEYS``.
+
+        Returns:
+            Series of summed ``total_amount`` indexed by ``keys``.
+        """
+        if keys not in self._groupings:
+            self._groupings[keys] = (
+                self.base.groupby(list(keys), observed=True)[
+                    "total_amount"
+                ]
+                .sum()
+            )
+        return self._groupings[keys]
+
+    def order(self, key: str, ascending: bool = False) -> list:
+        """Return the values of ``key`` ordered by total spend."""
+        return (
+            self.spend_by(key)
+            .sort_values(ascending=ascending)
+            .index.tolist()
+        )
+
+
+def aggregation_context(
+    data: pd.DataFrame | AggregationContext,
+) -> AggregationContext:
+    """Wrap a frame in a context, passing an existing context through."""
+    if isinstance(data, AggregationContext):
+        return data
+    return AggregationContext(data)
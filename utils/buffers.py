@@ -0,0 +1,302 @@
+"""Append-only arrays shared by successive versions of a structure."""
+from __future__ import annotations
+
+import threading
+from typing import Any, Optional
+
+import numpy as np
+import pandas as pd
+
+# Capacity is multiplied by this factor whenever a buffer fills up, so
+# n appends copy O(n) items in total.
+GROWTH_FACTOR = 1.5
+
+MIN_CAPACITY = 64
+
+
+class AppendBuffer:
+    """NumPy array with spare capacity at the end of axis 0.
+
+    A buffer is shared by every version of the structure built on it.
+    Each version remembers how many items it holds and reads a prefix
+    ``view`` of that length; items past a version's length are never
+    seen by it. Extending the newest version therefore writes into the
+    spare capacity without touching what older versions read, and
+    only a full buffer is reallocated (geometrically, leaving older
+    versions their previous array). Extending an older version copies
+    its prefix first, so the newer versions are not overwritten.
+
+    Args:
+        values: Initial items.
+        capacity: Initial number of items the buffer can hold.
+    """
+
+    def __init__(
+        self, values: np.ndarray, capacity: Optional[int] = None
+    ) -> None:
+        values = np.asarray(values)
+        capacity = max(capacity or _grown(len(values)), len(values))
+        self._data = np.empty(
+            (capacity,) + values.shape[1:], dtype=values.dtype
+        )
+        self._data[: len(values)] = values
+        self._length = len(values)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._length
+
+    @property
+    def dtype(self) -> np.dtype:
+        """dtype of the items."""
+        return self._data.dtype
+
+    @property
+    def capacity(self) -> int:
+        """Number of items that fit before the next reallocation."""
+        return len(self._data)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes allocated, including spare capacity."""
+        return int(self._data.nbytes)
+
+    def view(self, length: Optional[int] = None) -> np.ndarray:
+        """Return the first ``length`` items (all by default).
+
+        The result shares memory with the buffer and must not be
+        written to.
+        """
+        return self._data[: self._length if length is None else length]
+
+    def copy(self, length: Optional[int] = None) -> AppendBuffer:
+        """Return a new buffer holding the first ``length`` items."""
+        return AppendBuffer(self.view(length))
+
+    def extend(
+        self,
+        length: int,
+        values: np.ndarray,
+        start: Optional[int] = None,
+    ) -> AppendBuffer:
+        """Return a buffer holding a version's items plus ``values``.
+
+        The result holds the first ``start`` items of the version that
+        has ``length`` items, followed by ``values``. ``start``
+        defaults to ``length``. When that version is the newest one
+        the items are written in place and this buffer is returned;
+        a ``start`` below ``length`` then overwrites items older
+        versions still read, so it is only safe for changes they
+        ignore (e.g. setting bits past their last row). Otherwise, or
+        when the result would be shorter than this buffer, a copy is
+        extended and this buffer is left untouched.
+
+        Args:
+            length: Number of items of the version being extended.
+            values: Items to write from ``start``.
+            start: Position of the first item written.
+
+        Returns:
+            The buffer now holding ``start + len(values)`` items.
+        """
+        start = length if start is None else start
+        end = start + len(values)
+        with self._lock:
+            if length == self._length and end >= length:
+                if end > self.capacity:
+                    data = np.empty(
+                        (_grown(end),) + self._data.shape[1:],
+                        dtype=self._data.dtype,
+                    )
+                    data[:start] = self._data[:start]
+                    self._data = data
+                self._data[start:end] = values
+                self._length = end
+                return self
+        buffer = AppendBuffer(self._data[:start], capacity=_grown(end))
+        buffer._data[start:end] = values
+        buffer._length = end
+        return buffer
+
+
+def _grown(length: int) -> int:
+    """Return the capacity to allocate for ``length`` items."""
+    return max(int(length * GROWTH_FACTOR), MIN_CAPACITY)
+
+
+def _is_arrow(dtype: Any) -> bool:
+    """Return whether a pandas dtype is backed by Arrow arrays."""
+    return isinstance(dtype, pd.ArrowDtype) or (
+        isinstance(dtype, pd.StringDtype) and dtype.storage == "pyarrow"
+    )
+
+
+def _codes_dtype(dtype: pd.CategoricalDtype) -> np.dtype:
+    """Return the integer dtype pandas uses for codes of ``dtype``."""
+    return pd.Categorical.from_codes([], dtype=dtype).codes.dtype
+
+
+class FrameBuffer:
+    """DataFrame columns held in append buffers.
+
+    Every ``append`` returns a new FrameBuffer whose ``frame`` is a
+    DataFrame over the first ``n_rows`` items of each column, built
+    without copying: NumPy columns (numbers, dates, booleans, objects)
+    and categorical codes live in ``AppendBuffer`` objects shared with
+    the FrameBuffer appended to, and Arrow-backed columns (e.g. pandas'
+    ``str``) keep their immutable chunks. Appending therefore costs
+    O(appended rows) for those columns, plus an occasional geometric
+    reallocation. Other extension dtypes are concatenated, in
+    O(rows).
+
+    Arrow chunks are merged whenever the last chunk is at least half
+    the size of the one before, so a column has O(log rows) chunks
+    and each row is copied O(log rows) times over all appends.
+
+    Args:
+        columns: Column name -> AppendBuffer, list of Arrow chunks or
+            pandas array.
+        dtypes: Column name -> pandas dtype of the column.
+        n_rows: Number of rows.
+    """
+
+    def __init__(
+        self, columns: dict[str, Any], dtypes: dict[str, Any], n_rows: int
+    ) -> None:
+        self._columns = columns
+        self._dtypes = dtypes
+        self.n_rows = n_rows
+        self._frame: Optional[pd.DataFrame] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> FrameBuffer:
+        """Copy the columns of ``df`` into new buffers."""
+        columns, dtypes = {}, {}
+        for name in df.columns:
+            columns[name], dtypes[name] = _to_storage(df[name])
+        return cls(columns, dtypes, len(df))
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        """DataFrame view of the rows, built on first use.
+
+        The arrays share memory with the buffers, so the frame must
+        be treated as read-only; NumPy arrays are flagged as such.
+        """
+        with self._lock:
+            if self._frame is None:
+                self._frame = pd.DataFrame(
+                    {
+                        name: self._column(name)
+                        for name in self._columns
+                    },
+                    copy=False,
+                )
+            return self._frame
+
+    def _column(self, name: str) -> Any:
+        """Return one column of ``frame``."""
+        storage, dtype = self._columns[name], self._dtypes[name]
+        if isinstance(storage, AppendBuffer):
+            values = storage.view(self.n_rows)
+            values.flags.writeable = False
+            if isinstance(dtype, pd.CategoricalDtype):
+                return pd.Categorical.from_codes(
+                    values, dtype=dtype, validate=False
+                )
+            return values
+        if isinstance(storage, list):
+            import pyarrow as pa
+
+            return pd.array(pa.chunked_array(storage), dtype=dtype)
+        return storage
+
+    def with_columns(self, **columns: pd.Series) -> FrameBuffer:
+        """Return a FrameBuffer with some columns replaced.
+
+        Only the replaced columns are copied, e.g. to widen a dtype.
+        """
+        storage, dtypes = dict(self._columns), dict(self._dtypes)
+        for name, values in columns.items():
+            storage[name], dtypes[name] = _to_storage(values)
+        return FrameBuffer(storage, dtypes, self.n_rows)
+
+    def append(self, delta: pd.DataFrame) -> FrameBuffer:
+        """Return a FrameBuffer with the rows of ``delta`` appended.
+
+        ``delta`` must have the same columns. Categorical columns
+        take the union of both categories, the existing ones first,
+        so existing codes stay valid; a NumPy column whose dtype
+        cannot hold ``delta``'s values is widened (O(rows), once).
+
+        Args:
+            delta: Rows to append.
+
+        Returns:
+            New FrameBuffer; this one still reads its own rows.
+        """
+        if set(delta.columns) != set(self._columns):
+            raise ValueError("Appended rows have different columns")
+        columns, dtypes = {}, {}
+        for name, storage in self._columns.items():
+            columns[name], dtypes[name] = self._extend(
+                storage, self._dtypes[name], delta[name]
+            )
+        return FrameBuffer(columns, dtypes, self.n_rows + len(delta))
+
+    def _extend(
+        self, storage: Any, dtype: Any, values: pd.Series
+    ) -> tuple[Any, Any]:
+        """Append one column's values; returns (storage, dtype)."""
+        n = self.n_rows
+        if isinstance(dtype, pd.CategoricalDtype):
+            values = pd.Categorical(values)
+            new = values.categories.difference(dtype.categories, sort=False)
+            if len(new):
+                dtype = pd.CategoricalDtype(
+                    dtype.categories.append(new), ordered=dtype.ordered
+                )
+            codes = dtype.categories.get_indexer(values.categories)
+            codes = np.where(values.codes >= 0, codes[values.codes], -1)
+            if _codes_dtype(dtype) != storage.dtype:
+                storage = AppendBuffer(
+                    storage.view(n).astype(_codes_dtype(dtype))
+                )
+            return storage.extend(n, codes.astype(storage.dtype)), dtype
+        if isinstance(storage, AppendBuffer):
+            values = np.asarray(values.to_numpy())
+            widest = storage.dtype
+            if values.dtype.kind != "M" or widest.kind != "M":
+                widest = np.promote_types(widest, values.dtype)
+            if widest != storage.dtype:
+                storage = AppendBuffer(storage.view(n).astype(widest))
+            return storage.extend(n, values.astype(widest)), widest
+        if isinstance(storage, list):
+            import pyarrow as pa
+
+            chunk = pa.array(values.array, type=storage[0].type)
+            chunks = storage + [chunk]
+            while len(chunks) > 1 and 2 * len(chunks[-1]) >= len(
+                chunks[-2]
+            ):
+                chunks[-2:] = [pa.concat_arrays(chunks[-2:])]
+            return chunks, dtype
+        return (
+            pd.concat([pd.Series(storage), values], ignore_index=True).array,
+            dtype,
+        )
+
+
+def _to_storage(values: pd.Series) -> tuple[Any, Any]:
+    """Return (storage, dtype) of one column for ``FrameBuffer``."""
+    dtype = values.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        return AppendBuffer(np.asarray(values.array.codes)), dtype
+    if isinstance(dtype, np.dtype):
+        return AppendBuffer(values.to_numpy()), dtype
+    if _is_arrow(dtype):
+        import pyarrow as pa
+
+        return [pa.array(values.array)], dtype
+    return values.array.copy(), dtype
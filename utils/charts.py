@@ -1,9 +1,24 @@
-"""Plotly chart functions for the healthcare spend dashboard."""
-import plotly.express as px
-import plotly.graph_objects as go
+"""Plotly chart functions for the healthcare spend dashboard.
+
+Every chart accepts either a filtered DataFrame or an
+``AggregationContext`` over one; pass the same context to all charts
+of a rerun so their groupings are computed once and shared.
+"""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
 
 import pandas as pd
 
+from utils.aggregations import AggregationContext, aggregation_context
+from utils.profiling import timed
+
+# Plotly is imported inside each chart function: ``plotly.express``
+# pulls in a large dependency tree, and deferring it keeps it off the
+# path to the first KPI render on a cold start.
+if TYPE_CHECKING:
+    import plotly.graph_objects as go
+
 
 HEALTHCARE_COLORS = [
     "#0e4d92",
@@ -46,19 +61,25 @@ def _format_dollars(value: float) -> str:
     return f"${value:,.0f}"
 
 
-def spend_by_category(df: pd.DataFrame) -> go.Figure:
+@timed()
+def spend_by_category(
+    df: pd.DataFrame | AggregationContext,
+) -> go.Figure:
     """Create a horizontal bar chart of spend by category.
 
     Args:
-        df: Filtered DataFrame.
+        df: Filtered DataFrame or its AggregationContext.
 
     Returns:
         Plotly Figure with horizontal bars sorted descending.
     """
+    import plotly.graph_objects as go
+
+    ctx = aggregation_context(df)
     cat_spend = (
-        df.groupby("spend_category", as_index=False)["total_amount"]
-        .sum()
-        .sort_values("total_amount", ascending=True)
+        ctx.spend_by("spend_category")
+        .sort_values(ascending=True)
+        .reset_index()
     )
 
     fig = go.Figure(
@@ -97,31 +118,23 @@ def spend_by_category(df: pd.DataFrame) -> go.Figure:
     return fig
 
 
-def monthly_spend_trend(df: pd.DataFrame) -> go.Figure:
+@timed()
+def monthly_spend_trend(
+    df: pd.DataFrame | AggregationContext,
+) -> go.Figure:
     """Create a stacked area chart of monthly spend by category.
 
     Args:
-        df: Filtered DataFrame.
+        df: Filtered DataFrame or its AggregationContext.
 
     Returns:
         Plotly Figure with stacked area chart.
     """
-    df_monthly = (
-        df.assign(
-            month=df["transaction_date"].dt.to_period("M").dt.to_timestamp()
-        )
-        .groupby(["month", "spend_category"], as_index=False)[
-            "total_amount"
-        ]
-        .sum()
-    )
+    import plotly.express as px
 
-    cat_order = (
-        df.groupby("spend_category")["total_amount"]
-        .sum()
-        .sort_values(ascending=False)
-        .index.tolist()
-    )
+    ctx = aggregation_context(df)
+    df_monthly = ctx.spend_by("month", "spend_category").reset_index()
+    cat_order = ctx.order("spend_category")
 
     fig = px.area(
         df_monthly,
@@ -171,37 +184,31 @@ def monthly_spend_trend(df: pd.DataFrame) -> go.Figure:
     return fig
 
 
-def top_vendors_by_spend(df: pd.DataFrame, top_n: int = 15) -> go.Figure:
+@timed()
+def top_vendors_by_spend(
+    df: pd.DataFrame | AggregationContext, top_n: int = 15
+) -> go.Figure:
     """Create a horizontal stacked bar of top vendors by contract type.
 
     Args:
-        df: Filtered DataFrame.
+        df: Filtered DataFrame or its AggregationContext.
         top_n: Number of top vendors to show.
 
     Returns:
         Plotly Figure with stacked horizontal bars.
     """
-    vendor_total = (
-        df.groupby("vendor_name")["total_amount"]
-        .sum()
-        .nlargest(top_n)
-        .index.tolist()
-    )
-
-    df_top = df[df["vendor_name"].isin(vendor_total)]
-    vendor_contract = (
-        df_top.groupby(
-            ["vendor_name", "contract_type"], as_index=False
-        )["total_amount"]
-        .sum()
-    )
+    import plotly.graph_objects as go
+
+    ctx = aggregation_context(df)
+    top_totals = ctx.spend_by("vendor_name").nlargest(top_n)
+    vendor_contract = ctx.spend_by("vendor_name", "contract_type")
+    vendor_contract = vendor_contract[
+        vendor_contract.index.get_level_values("vendor_name").isin(
+            top_totals.index
+        )
+    ].reset_index()
 
-    vendor_order = (
-        df_top.groupby("vendor_name")["total_amount"]
-        .sum()
-        .sort_values(ascending=True)
-        .index.tolist()
-    )
+    vendor_order = top_totals.sort_values(ascending=True).index.tolist()
 
     fig = go.Figure()
 
@@ -209,9 +216,9 @@ def top_vendors_by_spend(df: pd.DataFrame, top_n: int = 15) -> go.Figure:
         ct_data = vendor_contract[
             vendor_contract["contract_type"] == ct
         ]
-        ct_data = ct_data.set_index("vendor_name").reindex(
-            vendor_order, fill_value=0
-        )
+        ct_data = ct_data.set_index("vendor_name")[
+            ["total_amount"]
+        ].reindex(vendor_order, fill_value=0)
 
         fig.add_trace(
             go.Bar(
@@ -227,11 +234,7 @@ def top_vendors_by_spend(df: pd.DataFrame, top_n: int = 15) -> go.Figure:
             )
         )
 
-    total_by_vendor = (
-        df_top.groupby("vendor_name")["total_amount"]
-        .sum()
-        .reindex(vendor_order)
-    )
+    total_by_vendor = top_totals.reindex(vendor_order)
     fig.add_trace(
         go.Scatter(
             y=vendor_order,
@@ -272,19 +275,25 @@ def top_vendors_by_spend(df: pd.DataFrame, top_n: int = 15) -> go.Figure:
     return fig
 
 
-def vendor_treemap(df: pd.DataFrame) -> go.Figure:
+@timed()
+def vendor_treemap(
+    df: pd.DataFrame | AggregationContext,
+) -> go.Figure:
     """Create a treemap showing vendor share of total spend.
 
     Args:
-        df: Filtered DataFrame.
+        df: Filtered DataFrame or its AggregationContext.
 
     Returns:
         Plotly Figure with treemap visualization.
     """
+    import plotly.express as px
+
     vendor_spend = (
-        df.groupby("vendor_name", as_index=False)["total_amount"]
-        .sum()
-        .sort_values("total_amount", ascending=False)
+        aggregation_context(df)
+        .spend_by("vendor_name")
+        .sort_values(ascending=False)
+        .reset_index()
     )
     total = vendor_spend["total_amount"].sum()
     vendor_spend["pct"] = vendor_spend["total_amount"] / total * 100
@@ -327,35 +336,24 @@ def vendor_treemap(df: pd.DataFrame) -> go.Figure:
     return fig
 
 
-def spend_by_facility(df: pd.DataFrame) -> go.Figure:
+@timed()
+def spend_by_facility(
+    df: pd.DataFrame | AggregationContext,
+) -> go.Figure:
     """Create a grouped bar chart of spend by facility and category.
 
     Args:
-        df: Filtered DataFrame.
+        df: Filtered DataFrame or its AggregationContext.
 
     Returns:
         Plotly Figure with grouped bars.
     """
-    fac_cat = (
-        df.groupby(
-            ["facility_name", "spend_category"], as_index=False
-        )["total_amount"]
-        .sum()
-    )
-
-    cat_order = (
-        df.groupby("spend_category")["total_amount"]
-        .sum()
-        .sort_values(ascending=False)
-        .index.tolist()
-    )
+    import plotly.express as px
 
-    fac_order = (
-        df.groupby("facility_name")["total_amount"]
-        .sum()
-        .sort_values(ascending=False)
-        .index.tolist()
-    )
+    ctx = aggregation_context(df)
+    fac_cat = ctx.spend_by("facility_name", "spend_category").reset_index()
+    cat_order = ctx.order("spend_category")
+    fac_order = ctx.order("facility_name")
 
     fig = px.bar(
         fac_cat,
@@ -405,33 +403,26 @@ def spend_by_facility(df: pd.DataFrame) -> go.Figure:
     return fig
 
 
-def facility_ppi_mix(df: pd.DataFrame) -> go.Figure:
+@timed()
+def facility_ppi_mix(
+    df: pd.DataFrame | AggregationContext,
+) -> go.Figure:
     """Create a grouped bar showing PPI vs non-PPI spend per facility.
 
     Args:
-        df: Filtered DataFrame.
+        df: Filtered DataFrame or its AggregationContext.
 
     Returns:
         Plotly Figure with grouped bars.
     """
-    df_ppi = df.copy()
-    df_ppi["ppi_label"] = df_ppi["ppi_flag"].map(
-        {True: "PPI", False: "Non-PPI"}
-    )
+    import plotly.express as px
 
-    fac_ppi = (
-        df_ppi.groupby(
-            ["facility_name", "ppi_label"], as_index=False
-        )["total_amount"]
-        .sum()
-    )
-
-    fac_order = (
-        df.groupby("facility_name")["total_amount"]
-        .sum()
-        .sort_values(ascending=False)
-        .index.tolist()
+    ctx = aggregation_context(df)
+    fac_ppi = ctx.spend_by("facility_name", "ppi_flag").reset_index()
+    fac_ppi["ppi_label"] = fac_ppi["ppi_flag"].map(
+        {True: "PPI", False: "Non-PPI"}
     )
+    fac_order = ctx.order("facility_name")
 
     fig = px.bar(
         fac_ppi,
@@ -483,35 +474,32 @@ def facility_ppi_mix(df: pd.DataFrame) -> go.Figure:
     return fig
 
 
-def contract_type_by_category(df: pd.DataFrame) -> go.Figure:
+@timed()
+def contract_type_by_category(
+    df: pd.DataFrame | AggregationContext,
+) -> go.Figure:
     """Create a 100% stacked bar of contract mix per category.
 
     Args:
-        df: Filtered DataFrame.
+        df: Filtered DataFrame or its AggregationContext.
 
     Returns:
         Plotly Figure with 100% stacked horizontal bars.
     """
-    cat_contract = (
-        df.groupby(
-            ["spend_category", "contract_type"], as_index=False
-        )["total_amount"]
-        .sum()
-    )
+    import plotly.graph_objects as go
 
-    cat_totals = (
-        cat_contract.groupby("spend_category")["total_amount"]
-        .transform("sum")
+    ctx = aggregation_context(df)
+    cat_contract = ctx.spend_by("spend_category", "contract_type")
+    cat_totals = ctx.spend_by("spend_category").reindex(
+        cat_contract.index.get_level_values("spend_category")
     )
-    cat_contract["pct"] = cat_contract["total_amount"] / cat_totals * 100
-
-    cat_order = (
-        df.groupby("spend_category")["total_amount"]
-        .sum()
-        .sort_values(ascending=True)
-        .index.tolist()
+    cat_contract = cat_contract.reset_index()
+    cat_contract["pct"] = (
+        cat_contract["total_amount"] / cat_totals.to_numpy() * 100
     )
 
+    cat_order = ctx.order("spend_category", ascending=True)
+
     fig = go.Figure()
 
     for ct in ["GPO", "Local", "Off-Contract"]:
@@ -564,27 +552,28 @@ def contract_type_by_category(df: pd.DataFrame) -> go.Figure:
     return fig
 
 
-def off_contract_opportunities(df: pd.DataFrame) -> pd.DataFrame:
+@timed()
+def off_contract_opportunities(
+    df: pd.DataFrame | AggregationContext,
+) -> pd.DataFrame:
     """Identify categories with >20% off-contract spend.
 
     Args:
-        df: Filtered DataFrame.
+        df: Filtered DataFrame or its AggregationContext.
 
     Returns:
         DataFrame with category, off-contract %, total spend,
         and off-contract spend for flagged categories.
     """
-    cat_contract = (
-        df.groupby(
-            ["spend_category", "contract_type"], as_index=False
-        )["total_amount"]
-        .sum()
-    )
+    ctx = aggregation_context(df)
+    cat_contract = ctx.spend_by(
+        "spend_category", "contract_type"
+    ).reset_index()
 
     cat_totals = (
-        df.groupby("spend_category", as_index=False)["total_amount"]
-        .sum()
-        .rename(columns={"total_amount": "total_category_spend"})
+        ctx.spend_by("spend_category")
+        .rename("total_category_spend")
+        .reset_index()
     )
 
     off_contract = cat_contract[
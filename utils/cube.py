@@ -0,0 +1,306 @@
+"""Pre-aggregated spend cube over the dashboard's filter dimensions."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.indexing import day_ordinal, day_ordinals
+
+
+CUBE_DIMENSIONS = [
+    "transaction_date",
+    "facility_name",
+    "spend_category",
+    "vendor_name",
+    "contract_type",
+    "ppi_flag",
+]
+
+CUBE_MEASURES = ["total_amount", "transaction_count", "quantity"]
+
+
+def build_cube(df: pd.DataFrame) -> pd.DataFrame:
+    """Aggregate transactions into one row per non-empty cube cell.
+
+    A cell is a day x facility x category x vendor x contract type x
+    PPI combination. The result keeps the dimension column names and
+    dtypes of the transaction frame, with ``total_amount`` and
+    ``quantity`` summed and ``transaction_count`` counting rows, so
+    ``apply_filters``, ``calculate_kpis`` and the chart functions
+    accept it in place of raw transactions. Every dimension is low
+    cardinality, so the cube's size is bounded by the number of
+    combinations rather than by transaction volume.
+
+    Args:
+        df: Transaction-level DataFrame.
+
+    Returns:
+        Cube DataFrame sorted by ``transaction_date``.
+    """
+    keys = df[CUBE_DIMENSIONS].assign(
+        transaction_date=df["transaction_date"].dt.normalize()
+    )
+    measures = pd.DataFrame(
+        {
+            "total_amount": df["total_amount"].astype("float64"),
+            "transaction_count": 1,
+            "quantity": df["quantity"].astype("int64"),
+        },
+        index=df.index,
+    )
+    cube = (
+        pd.concat([keys, measures], axis=1)
+        .groupby(CUBE_DIMENSIONS, observed=True, sort=True)[CUBE_MEASURES]
+        .sum()
+        .reset_index()
+    )
+    return cube
+
+
+def _cumulative(
+    flat_index: np.ndarray,
+    weights: Optional[np.ndarray],
+    shape: tuple[int, ...],
+) -> np.ndarray:
+    """Scatter weights into ``shape`` and prefix-sum the last axis.
+
+    The result has one more entry on the last axis than ``shape``,
+    starting at zero, so ``out[..., hi] - out[..., lo]`` is the total
+    over days ``lo`` to ``hi - 1``.
+    """
+    size = int(np.prod(shape))
+    totals = np.bincount(flat_index, weights=weights, minlength=size)
+    totals = totals.reshape(shape)
+    out = np.zeros(shape[:-1] + (shape[-1] + 1,), dtype=totals.dtype)
+    np.cumsum(totals, axis=-1, out=out[..., 1:])
+    return out
+
+
+@dataclass
+class PrefixSums:
+    """Daily cumulative spend totals per facility x category slice.
+
+    Each measure array has shape ``(facilities, categories, days + 1)``
+    and holds running totals from the first day of data, so the total
+    over any date range of a slice is the difference of two entries.
+
+    Attributes:
+        first_day: Day ordinal of index 0 on the day axis.
+        facilities: Facility names along axis 0.
+        categories: Spend categories along axis 1.
+        vendors: Vendor names along axis 0 of ``vendor_days``.
+        spend: Cumulative ``total_amount``.
+        count: Cumulative transaction count.
+        ppi_spend: Cumulative ``total_amount`` of PPI items.
+        vendor_days: Cumulative count of cube rows per vendor over
+            all slices, shape ``(vendors, days + 1)``; a vendor was
+            active in a range if its difference is non-zero.
+    """
+
+    first_day: int
+    facilities: list[str]
+    categories: list[str]
+    vendors: list[str]
+    spend: np.ndarray
+    count: np.ndarray
+    ppi_spend: np.ndarray
+    vendor_days: np.ndarray
+
+    @property
+    def n_days(self) -> int:
+        """Number of days covered by the arrays."""
+        return self.spend.shape[-1] - 1
+
+    @classmethod
+    def build(cls, cube: pd.DataFrame) -> PrefixSums:
+        """Build the cumulative arrays from a cube or transaction frame.
+
+        Args:
+            cube: Frame as returned by ``build_cube``; a transaction
+                frame works too (each row then counts once).
+
+        Returns:
+            PrefixSums covering the frame's first to last day.
+        """
+        days = day_ordinals(cube["transaction_date"]).astype(np.int64)
+        first_day = int(days.min()) if len(days) else 0
+        n_days = int(days.max()) - first_day + 1 if len(days) else 0
+        day_idx = days - first_day
+
+        fac_codes, facilities = pd.factorize(
+            cube["facility_name"], sort=True
+        )
+        cat_codes, categories = pd.factorize(
+            cube["spend_category"], sort=True
+        )
+        vendor_codes, vendors = pd.factorize(
+            cube["vendor_name"], sort=True
+        )
+
+        amount = cube["total_amount"].to_numpy(dtype=np.float64)
+        if "transaction_count" in cube.columns:
+            count = cube["transaction_count"].to_numpy(dtype=np.float64)
+        else:
+            count = np.ones(len(cube))
+        ppi = cube["ppi_flag"].to_numpy(dtype=bool)
+
+        shape = (len(facilities), len(categories), n_days)
+        flat = (fac_codes * shape[1] + cat_codes) * n_days + day_idx
+        return cls(
+            first_day=first_day,
+            facilities=list(facilities),
+            categories=list(categories),
+            vendors=list(vendors),
+            spend=_cumulative(flat, amount, shape),
+            count=np.rint(_cumulative(flat, count, shape)).astype(np.int64),
+            ppi_spend=_cumulative(flat, amount * ppi, shape),
+            vendor_days=_cumulative(
+                vendor_codes * n_days + day_idx,
+                None,
+                (len(vendors), n_days),
+            ),
+        )
+
+    def append(self, cube: pd.DataFrame) -> PrefixSums:
+        """Return prefix sums that also include appended transactions.
+
+        The arrays are extended to the new last day (carrying the
+        running totals forward) and to any facility, category or
+        vendor first seen in ``cube``, which is appended to the end
+        of its axis. The appended rows are then added as their own
+        cumulative totals, so the cost depends on the array size and
+        ``cube``, not on the history.
+
+        Args:
+            cube: Cube (or transaction frame) of the appended rows,
+                dated no earlier than ``first_day``.
+
+        Returns:
+            New PrefixSums over the history plus ``cube``.
+
+        Raises:
+            ValueError: If ``cube`` has rows before ``first_day``.
+        """
+        if cube.empty:
+            return self
+        if self.n_days == 0:
+            return PrefixSums.build(cube)
+
+        days = day_ordinals(cube["transaction_date"]).astype(np.int64)
+        if days.min() < self.first_day:
+            raise ValueError("Appended rows start before first_day")
+        n_days = max(self.n_days, int(days.max()) - self.first_day + 1)
+        day_idx = days - self.first_day
+
+        def _extend(names: list[str], column: str) -> list[str]:
+            known = set(names)
+            new = sorted(
+                v for v in pd.unique(cube[column]).tolist() if v not in known
+            )
+            return names + new
+
+        facilities = _extend(self.facilities, "facility_name")
+        categories = _extend(self.categories, "spend_category")
+        vendors = _extend(self.vendors, "vendor_name")
+
+        def _grow(cumulative: np.ndarray, leading: tuple) -> np.ndarray:
+            out = np.zeros(leading + (n_days + 1,), dtype=cumulative.dtype)
+            index = tuple(slice(0, n) for n in cumulative.shape[:-1])
+            out[index + (slice(0, self.n_days + 1),)] = cumulative
+            out[index + (slice(self.n_days + 1, None),)] = cumulative[
+                ..., -1:
+            ]
+            return out
+
+        fac_codes = pd.Index(facilities).get_indexer(cube["facility_name"])
+        cat_codes = pd.Index(categories).get_indexer(cube["spend_category"])
+        vendor_codes = pd.Index(vendors).get_indexer(cube["vendor_name"])
+        amount = cube["total_amount"].to_numpy(dtype=np.float64)
+        if "transaction_count" in cube.columns:
+            count = cube["transaction_count"].to_numpy(dtype=np.float64)
+        else:
+            count = np.ones(len(cube))
+        ppi = cube["ppi_flag"].to_numpy(dtype=bool)
+
+        shape = (len(facilities), len(categories), n_days)
+        flat = (fac_codes * shape[1] + cat_codes) * n_days + day_idx
+        vendor_shape = (len(vendors), n_days)
+        return PrefixSums(
+            first_day=self.first_day,
+            facilities=facilities,
+            categories=categories,
+            vendors=vendors,
+            spend=_grow(self.spend, shape[:2])
+            + _cumulative(flat, amount, shape),
+            count=_grow(self.count, shape[:2])
+            + np.rint(_cumulative(flat, count, shape)).astype(np.int64),
+            ppi_spend=_grow(self.ppi_spend, shape[:2])
+            + _cumulative(flat, amount * ppi, shape),
+            vendor_days=_grow(self.vendor_days, vendor_shape[:1])
+            + _cumulative(
+                vendor_codes * n_days + day_idx, None, vendor_shape
+            ),
+        )
+
+    def _day_bounds(self, start: date, end: date) -> tuple[int, int]:
+        """Map an inclusive date range to prefix-array positions."""
+        lo = day_ordinal(start) - self.first_day
+        hi = day_ordinal(end) - self.first_day + 1
+        lo = min(max(lo, 0), self.n_days)
+        hi = min(max(hi, lo), self.n_days)
+        return lo, hi
+
+    def _selection(
+        self, names: list[str], selected: Optional[list[str]]
+    ) -> np.ndarray | slice:
+        """Return the positions of ``selected`` along one axis."""
+        if not selected:
+            return slice(None)
+        wanted = set(selected)
+        return np.array(
+            [i for i, name in enumerate(names) if name in wanted],
+            dtype=np.int64,
+        )
+
+    def totals(
+        self,
+        start: date,
+        end: date,
+        facilities: Optional[list[str]] = None,
+        categories: Optional[list[str]] = None,
+    ) -> dict:
+        """Return spend, count and PPI spend for a date range and slice.
+
+        Args:
+            start: First day of the range (inclusive).
+            end: Last day of the range (inclusive).
+            facilities: Facilities to include; all if None or empty.
+            categories: Categories to include; all if None or empty.
+
+        Returns:
+            Dictionary with keys total_spend, transaction_count and
+            ppi_spend.
+        """
+        lo, hi = self._day_bounds(start, end)
+        fac = self._selection(self.facilities, facilities)
+        cat = self._selection(self.categories, categories)
+
+        def _range_total(cumulative: np.ndarray) -> float:
+            per_slice = cumulative[..., hi] - cumulative[..., lo]
+            return per_slice[fac][:, cat].sum()
+
+        return {
+            "total_spend": float(_range_total(self.spend)),
+            "transaction_count": int(_range_total(self.count)),
+            "ppi_spend": float(_range_total(self.ppi_spend)),
+        }
+
+    def distinct_vendors(self, start: date, end: date) -> int:
+        """Count vendors with any spend in a date range, all slices."""
+        lo, hi = self._day_bounds(start, end)
+        active = self.vendor_days[:, hi] - self.vendor_days[:, lo]
+        return int(np.count_nonzero(active))
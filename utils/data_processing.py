@@ -1,15 +1,38 @@
 """Data loading, filtering, and KPI calculation utilities."""
 from __future__ import annotations
 
-from datetime import date
+import hashlib
+import logging
+import os
+import uuid
+from dataclasses import dataclass
+from datetime import date, timedelta
 from pathlib import Path
 from typing import Optional
+from urllib.parse import unquote
 
+import numpy as np
 import pandas as pd
 import streamlit as st
 
+from utils.cube import PrefixSums
+from utils.indexing import FilterIndex, FilterStats, filter_predicates
+from utils.profiling import timed
+from utils.sketches import DistinctSketches
+
+# SPEND_DATA_PATH points the app (or a benchmark run) at another CSV;
+# its partitioned dataset and cache live alongside it.
+DATA_PATH = Path(
+    os.environ.get(
+        "SPEND_DATA_PATH",
+        Path(__file__).parent.parent / "data" / "synthetic_spend_data.csv",
+    )
+)
+PARTITIONED_PATH = DATA_PATH.parent / "partitioned"
+CACHE_DIR = DATA_PATH.parent / ".cache"
+CACHE_VERSION = 2
 
-DATA_PATH = Path(__file__).parent.parent / "data" / "synthetic_spend_data.csv"
+logger = logging.getLogger(__name__)
 
 EXPECTED_COLUMNS = [
     "transaction_id",
@@ -26,36 +49,441 @@ EXPECTED_COLUMNS = [
     "ppi_flag",
 ]
 
+DIMENSION_COLUMNS = [
+    "facility_name",
+    "department",
+    "spend_category",
+    "vendor_name",
+    "product_description",
+    "contract_type",
+]
 
-@st.cache_data
-def load_data() -> pd.DataFrame:
-    """Load and validate the synthetic spend data CSV.
 
-    Returns:
-        DataFrame with parsed dates and validated schema.
+def _cache_path(csv_path: Path, variant: str = "typed") -> Path:
+    """Return the columnar cache file for the CSV's current version.
 
-    Raises:
-        FileNotFoundError: If the CSV file does not exist.
-        ValueError: If required columns are missing.
+    The file name embeds a digest of the CSV's size and modification
+    time (and ``CACHE_VERSION``), so any rewrite of the CSV resolves
+    to a new cache file.
     """
-    if not DATA_PATH.exists():
-        raise FileNotFoundError(f"Data file not found: {DATA_PATH}")
+    stat = csv_path.stat()
+    fingerprint = (
+        f"{CACHE_VERSION}:{csv_path.resolve()}:"
+        f"{stat.st_size}:{stat.st_mtime_ns}"
+    )
+    digest = hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()[:16]
+    return CACHE_DIR / f"{csv_path.stem}.{variant}-{digest}.parquet"
+
+
+def _read_csv(csv_path: Path) -> pd.DataFrame:
+    """Parse and validate the spend CSV into typed, date-sorted rows."""
+    df = pd.read_csv(csv_path, parse_dates=["transaction_date"])
+    return prepare_rows(df)
 
-    df = pd.read_csv(DATA_PATH, parse_dates=["transaction_date"])
 
+def prepare_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """Validate raw spend rows and return them typed and date-sorted.
+
+    Raises:
+        ValueError: If required columns are missing.
+    """
     missing = set(EXPECTED_COLUMNS) - set(df.columns)
     if missing:
         raise ValueError(f"Missing columns: {missing}")
 
+    df["transaction_date"] = pd.to_datetime(df["transaction_date"])
     df["ppi_flag"] = df["ppi_flag"].astype(bool)
     df["total_amount"] = df["total_amount"].astype(float)
     df["unit_price"] = df["unit_price"].astype(float)
-    df["quantity"] = df["quantity"].astype(int)
+    df["quantity"] = df["quantity"].astype("int32")
+
+    if not df["transaction_date"].is_monotonic_increasing:
+        df = df.sort_values(
+            "transaction_date", kind="stable"
+        ).reset_index(drop=True)
 
     return df
 
 
-def apply_filters(
+def _write_cache(df: pd.DataFrame, cache_path: Path) -> None:
+    """Write the typed frame to Parquet and drop stale cache files.
+
+    The file is written under a temporary name unique to this writer
+    and renamed into place, so a concurrent reader never sees a
+    partial file and two workers building a cold cache at once never
+    write to the same file. Failures are swallowed: the cache is an
+    optimization, not a requirement.
+    """
+    tmp_path = cache_path.with_name(
+        f"{cache_path.name}.{os.getpid()}-{uuid.uuid4().hex[:8]}.tmp"
+    )
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        df.to_parquet(tmp_path, index=False)
+        tmp_path.replace(cache_path)
+        prefix = cache_path.stem.rsplit("-", 1)[0]
+        for stale in cache_path.parent.glob(f"{prefix}-*.parquet"):
+            if stale != cache_path:
+                stale.unlink(missing_ok=True)
+    except (OSError, ImportError):
+        try:
+            tmp_path.unlink(missing_ok=True)
+        except OSError:
+            pass
+
+
+def bytes_per_row(df: pd.DataFrame) -> float:
+    """Return the in-memory footprint of a DataFrame per row."""
+    if df.empty:
+        return 0.0
+    return float(df.memory_usage(index=True, deep=True).sum()) / len(df)
+
+
+def build_dictionary(
+    df: pd.DataFrame,
+    base: Optional[dict[str, pd.CategoricalDtype]] = None,
+) -> dict[str, pd.CategoricalDtype]:
+    """Build the shared category dictionary for the dimension columns.
+
+    Categories are sorted so the same data always yields the same
+    codes. When ``base`` is given its categories keep their codes and
+    values not seen before are appended after them, so frames encoded
+    with an older dictionary stay compatible with the new one.
+
+    Args:
+        df: DataFrame containing the dimension columns.
+        base: Existing dictionary to extend.
+
+    Returns:
+        Mapping of column name to CategoricalDtype.
+    """
+    dictionary: dict[str, pd.CategoricalDtype] = {}
+    for col in DIMENSION_COLUMNS:
+        values = sorted(pd.unique(df[col].dropna().astype(str)))
+        if base is not None and col in base:
+            known = list(base[col].categories)
+            seen = set(known)
+            values = known + [v for v in values if v not in seen]
+        dictionary[col] = pd.CategoricalDtype(values)
+    return dictionary
+
+
+def _downcast_money(series: pd.Series) -> pd.Series:
+    """Downcast a dollar column to float32 if every value survives.
+
+    A value survives if it round-trips through float32 unchanged at
+    cent precision.
+    """
+    values = series.to_numpy(dtype=np.float64)
+    narrowed = values.astype(np.float32)
+    if np.array_equal(
+        np.round(narrowed.astype(np.float64), 2), np.round(values, 2)
+    ):
+        return pd.Series(narrowed, index=series.index, name=series.name)
+    return series
+
+
+def compact_schema(
+    df: pd.DataFrame,
+    dictionary: Optional[dict[str, pd.CategoricalDtype]] = None,
+) -> pd.DataFrame:
+    """Convert a typed spend frame to the compact in-memory schema.
+
+    Dimension columns become categoricals over the shared dictionary,
+    ``quantity`` is narrowed to the smallest integer type that holds
+    it and the dollar columns are downcast to float32 where lossless.
+    Sums over float32 columns should be accumulated in float64.
+
+    Args:
+        df: DataFrame as returned by the typed loader.
+        dictionary: Shared category dictionary; built from ``df``
+            (extending nothing) when omitted.
+
+    Returns:
+        New DataFrame with the compact schema.
+    """
+    dictionary = build_dictionary(df, base=dictionary)
+    compact = df.copy()
+    for col, dtype in dictionary.items():
+        compact[col] = compact[col].astype(dtype)
+    compact["quantity"] = pd.to_numeric(
+        compact["quantity"], downcast="integer"
+    )
+    compact["unit_price"] = _downcast_money(compact["unit_price"])
+    compact["total_amount"] = _downcast_money(compact["total_amount"])
+    return compact
+
+
+def widen_money(df: pd.DataFrame) -> pd.DataFrame:
+    """Return ``df`` with float32 dollar columns back as float64.
+
+    ``compact_schema`` keeps dollars exact only to the cent, so the
+    widened values are rounded to cents; otherwise a float32 price
+    such as 63226.23 would be shown and exported as 63226.230469.
+    Use it on frames handed to users, not on whole loaded frames.
+    """
+    widened = {
+        col: df[col].astype(np.float64).round(2)
+        for col in ("unit_price", "total_amount")
+        if col in df.columns and df[col].dtype == np.float32
+    }
+    return df.assign(**widened) if widened else df
+
+
+def _load_typed(use_cache: bool) -> pd.DataFrame:
+    """Load the typed frame, reading or building the Parquet cache."""
+    if not use_cache:
+        return _read_csv(DATA_PATH)
+
+    cache_path = _cache_path(DATA_PATH)
+    if cache_path.exists():
+        try:
+            return pd.read_parquet(cache_path)
+        except (OSError, ImportError, ValueError):
+            pass
+
+    df = _read_csv(DATA_PATH)
+    _write_cache(df, cache_path)
+    return df
+
+
+def _load_compact(use_cache: bool) -> pd.DataFrame:
+    """Load the compact frame, reading or building its Parquet cache.
+
+    The compact cache stores the categoricals as Parquet dictionary
+    columns, so a cache hit rebuilds them without hashing any strings.
+    """
+    cache_path = _cache_path(DATA_PATH, variant="compact")
+    if use_cache and cache_path.exists():
+        try:
+            return pd.read_parquet(cache_path)
+        except (OSError, ImportError, ValueError):
+            pass
+
+    df = _load_typed(use_cache)
+    compact = compact_schema(df)
+    logger.info(
+        "Compact schema: %.1f -> %.1f bytes/row over %d rows",
+        bytes_per_row(df),
+        bytes_per_row(compact),
+        len(df),
+    )
+    if use_cache:
+        _write_cache(compact, cache_path)
+    return compact
+
+
+@dataclass(frozen=True)
+class Partition:
+    """One data file of a partitioned dataset.
+
+    Attributes:
+        path: File path (CSV or Parquet).
+        month: First day of the month the file covers.
+        facility: Facility the file is restricted to, or None if the
+            month is not sub-partitioned by facility.
+    """
+
+    path: Path
+    month: date
+    facility: Optional[str] = None
+
+    @property
+    def month_end(self) -> date:
+        """Last day of the month the file covers."""
+        next_month = (self.month + timedelta(days=32)).replace(day=1)
+        return next_month - timedelta(days=1)
+
+
+def list_partitions(root: Path) -> list[Partition]:
+    """Discover the data files of a ``year=/month=`` dataset.
+
+    Files may sit directly in a month directory or in percent-encoded
+    ``facility=<name>`` sub-directories. Other files are ignored.
+
+    Args:
+        root: Dataset root directory.
+
+    Returns:
+        Partitions ordered by path, i.e. by month.
+    """
+    partitions = []
+    for path in sorted(root.glob("year=*/month=*/**/*")):
+        if path.suffix not in (".csv", ".parquet") or not path.is_file():
+            continue
+        keys = dict(
+            part.split("=", 1)
+            for part in path.relative_to(root).parts[:-1]
+            if "=" in part
+        )
+        try:
+            month = date(int(keys["year"]), int(keys["month"]), 1)
+        except (KeyError, ValueError):
+            continue
+        facility = keys.get("facility")
+        partitions.append(
+            Partition(
+                path=path,
+                month=month,
+                facility=unquote(facility) if facility else None,
+            )
+        )
+    return partitions
+
+
+def prune_partitions(
+    partitions: list[Partition],
+    date_range: Optional[tuple[date, date]] = None,
+    facilities: Optional[list[str]] = None,
+) -> list[Partition]:
+    """Keep the partitions that can hold rows matching the filters.
+
+    Args:
+        partitions: Partitions from ``list_partitions``.
+        date_range: Tuple of (start_date, end_date); months not
+            overlapping it are dropped.
+        facilities: Selected facility names; facility sub-partitions
+            of other facilities are dropped.
+
+    Returns:
+        The surviving partitions, in their original order.
+    """
+    wanted = set(facilities) if facilities else None
+    kept = []
+    for partition in partitions:
+        if date_range is not None and (
+            partition.month_end < date_range[0]
+            or partition.month > date_range[1]
+        ):
+            continue
+        if (
+            wanted is not None
+            and partition.facility is not None
+            and partition.facility not in wanted
+        ):
+            continue
+        kept.append(partition)
+    return kept
+
+
+def _read_partition(partition: Partition) -> pd.DataFrame:
+    """Read one partition file as raw, unvalidated rows."""
+    if partition.path.suffix == ".parquet":
+        return pd.read_parquet(partition.path)
+    return pd.read_csv(partition.path, parse_dates=["transaction_date"])
+
+
+def load_partitioned(
+    root: Path,
+    date_range: Optional[tuple[date, date]] = None,
+    facilities: Optional[list[str]] = None,
+) -> pd.DataFrame:
+    """Load only the partitions of a dataset that a selection needs.
+
+    Pruning works at file granularity: every row of a surviving
+    partition is returned, so the result is a superset of the
+    selection and still has to go through ``apply_filters``.
+
+    Args:
+        root: Dataset root directory.
+        date_range: Tuple of (start_date, end_date).
+        facilities: Selected facility names.
+
+    Returns:
+        Typed DataFrame sorted by ``transaction_date``.
+
+    Raises:
+        ValueError: If required columns are missing.
+    """
+    partitions = list_partitions(root)
+    kept = prune_partitions(partitions, date_range, facilities)
+    logger.info(
+        "Reading %d of %d partitions under %s",
+        len(kept),
+        len(partitions),
+        root,
+    )
+    frames = [_read_partition(partition) for partition in kept]
+    if not frames:
+        frames = [pd.DataFrame(columns=EXPECTED_COLUMNS)]
+    return prepare_rows(pd.concat(frames, ignore_index=True))
+
+
+@timed(cache=st.cache_data)
+def load_data(
+    use_cache: bool = True,
+    compact: bool = False,
+    date_range: Optional[tuple[date, date]] = None,
+    facilities: Optional[list[str]] = None,
+) -> pd.DataFrame:
+    """Load and validate the synthetic spend data.
+
+    If ``data/partitioned`` holds a ``year=/month=`` dataset, only
+    the partitions overlapping ``date_range`` (and, when the months
+    are sub-partitioned by facility, matching ``facilities``) are
+    read. Otherwise the single CSV is loaded: the first load parses
+    it and writes a typed Parquet copy to ``data/.cache``, and later
+    loads read that copy for as long as the CSV's size and
+    modification time are unchanged; the CSV is never pruned. Rows
+    are always returned sorted by ``transaction_date``.
+
+    Args:
+        use_cache: If False, always parse the CSV and skip the cache.
+        compact: If True, return the compact schema (categorical
+            dimensions, narrowed numeric columns); see
+            ``compact_schema``.
+        date_range: Tuple of (start_date, end_date) used to prune a
+            partitioned dataset.
+        facilities: Facility names used to prune a partitioned
+            dataset.
+
+    Returns:
+        DataFrame with parsed dates and validated schema, holding at
+        least every row inside ``date_range`` and ``facilities``.
+
+    Raises:
+        FileNotFoundError: If neither the partitioned dataset nor the
+            CSV file exists.
+        ValueError: If required columns are missing.
+    """
+    if PARTITIONED_PATH.is_dir():
+        df = load_partitioned(PARTITIONED_PATH, date_range, facilities)
+        return compact_schema(df) if compact else df
+
+    if not DATA_PATH.exists():
+        raise FileNotFoundError(f"Data file not found: {DATA_PATH}")
+
+    if compact:
+        return _load_compact(use_cache)
+    return _load_typed(use_cache)
+
+
+def _date_rows(
+    dates: pd.Series, start: date, end: date
+) -> slice | np.ndarray:
+    """Select the rows of a date column within ``[start, end]``.
+
+    Sorted columns are resolved by binary search to a slice; unsorted
+    ones fall back to a vectorised datetime64 comparison.
+    """
+    lower = pd.Timestamp(start)
+    upper = pd.Timestamp(end) + pd.Timedelta(days=1)
+    if dates.is_monotonic_increasing:
+        lo = int(dates.searchsorted(lower, side="left"))
+        hi = int(dates.searchsorted(upper, side="left"))
+        return slice(lo, hi)
+    return ((dates >= lower) & (dates < upper)).to_numpy()
+
+
+def take_rows(df: pd.DataFrame, rows: slice | np.ndarray) -> pd.DataFrame:
+    """Select rows by position from a slice or a position array."""
+    if isinstance(rows, slice):
+        return df.iloc[rows]
+    return df.take(rows)
+
+
+@timed()
+def filter_positions(
     df: pd.DataFrame,
     date_range: Optional[tuple[date, date]] = None,
     facilities: Optional[list[str]] = None,
@@ -63,8 +491,15 @@ def apply_filters(
     vendors: Optional[list[str]] = None,
     contract_types: Optional[list[str]] = None,
     ppi_only: bool = False,
-) -> pd.DataFrame:
-    """Apply sidebar filter selections to the DataFrame.
+    index: Optional[FilterIndex] = None,
+    stats: Optional[FilterStats] = None,
+) -> slice | np.ndarray:
+    """Resolve sidebar filter selections to row positions of ``df``.
+
+    Nothing is copied: the date range narrows the rows to a block (by
+    binary search when the dates are sorted). The dimension filters
+    are then evaluated most selective first, each one only on the
+    rows the previous ones kept, stopping as soon as none are left.
 
     Args:
         df: Full unfiltered DataFrame.
@@ -74,60 +509,137 @@ def apply_filters(
         vendors: Selected vendor names.
         contract_types: Selected contract types.
         ppi_only: If True, filter to PPI items only.
+        index: Bitmap index built from ``df``; used instead of the
+            column comparisons when given.
+        stats: Value counts of ``df`` used to order the filters;
+            they are applied in the order above when omitted.
 
     Returns:
-        Filtered DataFrame.
+        A slice when at most the date range restricts the rows,
+        otherwise a sorted int64 array of row positions; either can
+        be passed to ``take_rows``.
     """
-    filtered = df.copy()
+    selection = dict(
+        date_range=date_range,
+        facilities=facilities,
+        categories=categories,
+        vendors=vendors,
+        contract_types=contract_types,
+        ppi_only=ppi_only,
+    )
+    if index is not None and index.n_rows == len(df):
+        return index.rows(**selection)
 
+    rows: slice | np.ndarray = slice(0, len(df))
+    kept: Optional[np.ndarray] = None
     if date_range is not None:
-        start, end = date_range
-        filtered = filtered[
-            (filtered["transaction_date"].dt.date >= start)
-            & (filtered["transaction_date"].dt.date <= end)
-        ]
+        rows = _date_rows(df["transaction_date"], *date_range)
+        if not isinstance(rows, slice):
+            kept, rows = np.flatnonzero(rows), slice(0, len(df))
+    block = df.iloc[rows]
 
-    if facilities:
-        filtered = filtered[
-            filtered["facility_name"].isin(facilities)
-        ]
-
-    if categories:
-        filtered = filtered[
-            filtered["spend_category"].isin(categories)
-        ]
-
-    if vendors:
-        filtered = filtered[
-            filtered["vendor_name"].isin(vendors)
-        ]
+    predicates = filter_predicates(
+        facilities, categories, vendors, contract_types, ppi_only
+    )
+    if stats is not None:
+        predicates = stats.plan(predicates)
+    for column, values in predicates:
+        if kept is not None and kept.size == 0:
+            break
+        if kept is None:
+            kept = np.flatnonzero(block[column].isin(values).to_numpy())
+        else:
+            values_kept = block[column].take(kept)
+            kept = kept[values_kept.isin(values).to_numpy()]
+
+    if kept is None:
+        return rows
+    return kept + rows.start
+
+
+@timed()
+def apply_filters(
+    df: pd.DataFrame,
+    date_range: Optional[tuple[date, date]] = None,
+    facilities: Optional[list[str]] = None,
+    categories: Optional[list[str]] = None,
+    vendors: Optional[list[str]] = None,
+    contract_types: Optional[list[str]] = None,
+    ppi_only: bool = False,
+    index: Optional[FilterIndex] = None,
+    stats: Optional[FilterStats] = None,
+) -> pd.DataFrame:
+    """Apply sidebar filter selections to the DataFrame.
 
-    if contract_types:
-        filtered = filtered[
-            filtered["contract_type"].isin(contract_types)
-        ]
+    The selection is resolved by ``filter_positions`` and the matching
+    rows are materialised once; a date-only selection on sorted data
+    returns a slice of ``df`` without copying.
 
-    if ppi_only:
-        filtered = filtered[filtered["ppi_flag"]]
+    Args:
+        df: Full unfiltered DataFrame.
+        date_range: Tuple of (start_date, end_date).
+        facilities: Selected facility names.
+        categories: Selected spend categories.
+        vendors: Selected vendor names.
+        contract_types: Selected contract types.
+        ppi_only: If True, filter to PPI items only.
+        index: Bitmap index built from ``df``. When given, the date
+            range is resolved to a row block by binary search and the
+            dimension filters from its bitmaps.
+        stats: Value counts of ``df`` used to apply the most
+            selective filter first; see ``filter_positions``.
 
-    return filtered
+    Returns:
+        Filtered DataFrame.
+    """
+    return take_rows(
+        df,
+        filter_positions(
+            df,
+            date_range=date_range,
+            facilities=facilities,
+            categories=categories,
+            vendors=vendors,
+            contract_types=contract_types,
+            ppi_only=ppi_only,
+            index=index,
+            stats=stats,
+        ),
+    )
 
 
+@timed()
 def calculate_kpis(df: pd.DataFrame) -> dict:
     """Calculate all KPI values from filtered data.
 
     Args:
-        df: Filtered DataFrame.
+        df: Filtered DataFrame of transactions or of cube cells (the
+            latter carry a ``transaction_count`` column).
 
     Returns:
         Dictionary with KPI keys: total_spend, transaction_count,
         unique_vendors, ppi_spend_pct, avg_transaction.
     """
-    total_spend = df["total_amount"].sum()
-    transaction_count = len(df)
-    unique_vendors = df["vendor_name"].nunique()
+    return _selection_kpis(_kpi_columns(df), slice(None))
+
+
+def kpis_from_totals(
+    total_spend: float,
+    transaction_count: int,
+    unique_vendors: int,
+    ppi_spend: float,
+) -> dict:
+    """Derive the KPI dictionary from the base aggregates.
 
-    ppi_spend = df.loc[df["ppi_flag"], "total_amount"].sum()
+    Args:
+        total_spend: Summed ``total_amount``.
+        transaction_count: Number of transactions.
+        unique_vendors: Number of distinct vendors.
+        ppi_spend: Summed ``total_amount`` of PPI items.
+
+    Returns:
+        Dictionary with the same keys as calculate_kpis.
+    """
     ppi_spend_pct = (
         (ppi_spend / total_spend * 100) if total_spend > 0 else 0.0
     )
@@ -147,10 +659,165 @@ def calculate_kpis(df: pd.DataFrame) -> dict:
     }
 
 
+def _kpi_columns(df: pd.DataFrame) -> dict:
+    """Return the columns the KPIs read, as zero-copy arrays."""
+    vendors = df["vendor_name"]
+    columns = {
+        "total_amount": df["total_amount"].to_numpy(),
+        "ppi_flag": df["ppi_flag"].to_numpy(dtype=bool),
+        "transaction_count": (
+            df["transaction_count"].to_numpy()
+            if "transaction_count" in df.columns
+            else None
+        ),
+        "vendor_name": vendors,
+    }
+    if isinstance(vendors.dtype, pd.CategoricalDtype):
+        columns["vendor_codes"] = vendors.cat.codes.to_numpy()
+        columns["n_vendors"] = len(vendors.cat.categories)
+    return columns
+
+
+def _selection_kpis(columns: dict, rows: slice | np.ndarray) -> dict:
+    """Calculate KPIs over a selection of the arrays of ``_kpi_columns``.
+
+    A slice selects views of the arrays, so date ranges of a sorted
+    frame are reduced in place; positions and masks gather only the
+    selected values.
+    """
+    amount = columns["total_amount"][rows]
+    ppi = columns["ppi_flag"][rows]
+    counts = columns["transaction_count"]
+    if "vendor_codes" in columns:
+        codes = columns["vendor_codes"][rows]
+        seen = np.bincount(
+            codes[codes >= 0], minlength=columns["n_vendors"]
+        )
+        unique_vendors = int(np.count_nonzero(seen))
+    else:
+        unique_vendors = columns["vendor_name"].iloc[rows].nunique()
+    return kpis_from_totals(
+        float(amount.sum(dtype=np.float64)),
+        int(counts[rows].sum()) if counts is not None else len(amount),
+        unique_vendors,
+        float(amount[ppi].sum(dtype=np.float64)),
+    )
+
+
+@timed()
+def calculate_period_kpis(
+    df_full: pd.DataFrame,
+    current_start: date,
+    current_end: date,
+    rows: Optional[slice | np.ndarray] = None,
+) -> tuple[dict, dict]:
+    """Calculate current and prior period KPIs together.
+
+    Equivalent to ``calculate_kpis`` over the current selection plus
+    ``calculate_prior_period`` over the unfiltered prior period, but
+    the columns are extracted once as arrays and every KPI of both
+    periods is reduced from them directly, with no intermediate
+    frames. On date-sorted frames the prior period is a contiguous
+    block reduced in place.
+
+    Args:
+        df_full: Full unfiltered DataFrame (transactions or cube).
+        current_start: Start of the current period.
+        current_end: End of the current period.
+        rows: Positions (or slice) of ``df_full`` in the current
+            selection, e.g. from ``filter_positions``; every row in
+            the current period if None.
+
+    Returns:
+        Tuple of (current KPIs, prior KPIs), each with the same keys
+        as calculate_kpis.
+    """
+    prior_end = current_start - timedelta(days=1)
+    prior_start = prior_end - (current_end - current_start)
+    dates = df_full["transaction_date"]
+    columns = _kpi_columns(df_full)
+
+    if rows is None:
+        rows = _date_rows(dates, current_start, current_end)
+    prior_rows = _date_rows(dates, prior_start, prior_end)
+    return _selection_kpis(columns, rows), _selection_kpis(
+        columns, prior_rows
+    )
+
+
+@timed()
+def calculate_range_kpis(
+    prefix_sums: PrefixSums,
+    start: date,
+    end: date,
+    facilities: Optional[list[str]] = None,
+    categories: Optional[list[str]] = None,
+    df: Optional[pd.DataFrame] = None,
+    sketches: Optional[DistinctSketches] = None,
+) -> dict:
+    """Calculate KPIs for a date range from prefix sums.
+
+    Only date, facility and category filters can be answered this
+    way; spend and counts take two lookups per facility x category
+    slice regardless of row count.
+
+    Args:
+        prefix_sums: Prefix sums for the full data.
+        start: First day of the range (inclusive).
+        end: Last day of the range (inclusive).
+        facilities: Selected facility names; all if None or empty.
+        categories: Selected spend categories; all if None or empty.
+        df: The same selection already filtered, used to count
+            distinct vendors exactly when facilities or categories
+            restrict the slice. Required in that case unless
+            ``sketches`` is given.
+        sketches: Vendor sketches; when given, unique vendors are
+            estimated by merging them instead of counted exactly.
+
+    Returns:
+        Dictionary with the same keys as calculate_kpis.
+    """
+    totals = prefix_sums.totals(start, end, facilities, categories)
+    if sketches is not None:
+        return kpis_from_totals(
+            totals["total_spend"],
+            totals["transaction_count"],
+            sketches.count(start, end, facilities, categories),
+            totals["ppi_spend"],
+        )
+
+    sliced = any(
+        selected and set(names) - set(selected)
+        for names, selected in (
+            (prefix_sums.facilities, facilities),
+            (prefix_sums.categories, categories),
+        )
+    )
+    if sliced:
+        if df is None:
+            raise ValueError(
+                "df is required when facilities or categories are set"
+            )
+        unique_vendors = df["vendor_name"].nunique()
+    else:
+        unique_vendors = prefix_sums.distinct_vendors(start, end)
+
+    return kpis_from_totals(
+        totals["total_spend"],
+        totals["transaction_count"],
+        unique_vendors,
+        totals["ppi_spend"],
+    )
+
+
+@timed()
 def calculate_prior_period(
     df_full: pd.DataFrame,
     current_start: date,
     current_end: date,
+    index: Optional[FilterIndex] = None,
+    prefix_sums: Optional[PrefixSums] = None,
+    sketches: Optional[DistinctSketches] = None,
 ) -> dict:
     """Calculate prior period KPIs for delta comparison.
 
@@ -161,20 +828,40 @@ def calculate_prior_period(
         df_full: Full unfiltered DataFrame.
         current_start: Start of the current period.
         current_end: End of the current period.
+        index: Bitmap index built from ``df_full``; its day ordinals
+            locate the prior period without scanning the dates.
+        prefix_sums: Prefix sums built from ``df_full``. When given,
+            the prior period is answered from them without touching
+            ``df_full``.
+        sketches: Vendor sketches; with ``prefix_sums``, unique
+            vendors are estimated from them instead of counted.
 
     Returns:
         Dictionary with the same keys as calculate_kpis.
     """
-    current_start_ts = pd.Timestamp(current_start)
-    current_end_ts = pd.Timestamp(current_end)
-    duration = current_end_ts - current_start_ts
-
-    prior_end = current_start_ts - pd.Timedelta(days=1)
+    duration = current_end - current_start
+    prior_end = current_start - timedelta(days=1)
     prior_start = prior_end - duration
 
-    prior_df = df_full[
-        (df_full["transaction_date"] >= prior_start)
-        & (df_full["transaction_date"] <= prior_end)
-    ]
+    if prefix_sums is not None:
+        totals = prefix_sums.totals(prior_start, prior_end)
+        if sketches is not None:
+            unique_vendors = sketches.count(prior_start, prior_end)
+        else:
+            unique_vendors = prefix_sums.distinct_vendors(
+                prior_start, prior_end
+            )
+        return kpis_from_totals(
+            totals["total_spend"],
+            totals["transaction_count"],
+            unique_vendors,
+            totals["ppi_spend"],
+        )
+
+    if index is not None and index.n_rows == len(df_full):
+        rows = index.date_slice(prior_start, prior_end)
+    else:
+        rows = _date_rows(df_full["transaction_date"], prior_start, prior_end)
+    prior_df = df_full.iloc[rows]
 
     return calculate_kpis(prior_df)
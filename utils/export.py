@@ -0,0 +1,127 @@
+"""Chunked export of the selected transactions to CSV or Parquet."""
+from __future__ import annotations
+
+import gzip
+import io
+import tempfile
+from typing import BinaryIO, Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+
+from utils.data_processing import widen_money
+
+DEFAULT_CHUNK_ROWS = 100_000
+
+# Label shown in the dashboard -> (format, file extension, MIME type).
+EXPORT_FORMATS = {
+    "CSV": ("csv", "csv", "text/csv"),
+    "CSV (gzip)": ("csv.gz", "csv.gz", "application/gzip"),
+    "Parquet": ("parquet", "parquet", "application/vnd.apache.parquet"),
+}
+
+
+def iter_row_chunks(
+    df: pd.DataFrame,
+    rows: slice | np.ndarray,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+) -> Iterator[pd.DataFrame]:
+    """Yield the selected rows of ``df`` in chunks, in row order.
+
+    At least one (possibly empty) chunk is yielded, so writers always
+    see the columns. Dollar columns are exported as float64 even when
+    ``df`` holds them as float32.
+
+    Args:
+        df: Frame to export from.
+        rows: Selected positions (or slice), e.g. from
+            ``FilterIndex.rows``.
+        chunk_rows: Maximum rows per chunk.
+    """
+    if isinstance(rows, slice):
+        rows = range(*rows.indices(len(df)))
+    if len(rows) == 0:
+        yield widen_money(df.iloc[:0])
+        return
+    for start in range(0, len(rows), chunk_rows):
+        part = rows[start : start + chunk_rows]
+        if isinstance(part, range):
+            yield widen_money(df.iloc[part.start : part.stop])
+        else:
+            yield widen_money(df.take(part))
+
+
+def write_export(
+    chunks: Iterable[pd.DataFrame], fmt: str, fh: BinaryIO
+) -> int:
+    """Write frames to a binary file one chunk at a time.
+
+    Only one chunk is converted at a time, so memory use depends on
+    the chunk size rather than on the number of rows. Parquet files
+    get one row group per chunk.
+
+    Args:
+        chunks: Frames with identical columns, e.g. from
+            ``iter_row_chunks``.
+        fmt: ``"csv"``, ``"csv.gz"`` or ``"parquet"``.
+        fh: Writable binary file; it is left open.
+
+    Returns:
+        Number of rows written.
+
+    Raises:
+        ValueError: If ``fmt`` is not a known format.
+    """
+    n_rows = 0
+    if fmt == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(fh, table.schema)
+            writer.write_table(table)
+            n_rows += len(chunk)
+        if writer is not None:
+            writer.close()
+        return n_rows
+
+    if fmt not in ("csv", "csv.gz"):
+        raise ValueError(f"Unknown export format: {fmt}")
+    sink = gzip.GzipFile(fileobj=fh, mode="wb") if fmt == "csv.gz" else fh
+    text = io.TextIOWrapper(sink, encoding="utf-8", newline="")
+    for i, chunk in enumerate(chunks):
+        chunk.to_csv(text, index=False, header=i == 0)
+        n_rows += len(chunk)
+    text.flush()
+    text.detach()
+    if sink is not fh:
+        sink.close()
+    return n_rows
+
+
+def export_file(chunks: Iterable[pd.DataFrame], fmt: str) -> io.RawIOBase:
+    """Export frames to a temporary file and return it rewound.
+
+    The file lives on disk and is deleted once closed. It is returned
+    unbuffered, a form ``st.download_button`` accepts.
+
+    Writing takes memory for one chunk only, but Streamlit then reads
+    the whole file into its in-memory media storage to serve it. Peak
+    memory of a download is therefore about the size of the exported
+    file, paid only when the button is clicked; callers should cap
+    the rows they export (the dashboard uses ``EXPORT_MAX_ROWS``).
+
+    Args:
+        chunks: Frames to export; see ``write_export``.
+        fmt: ``"csv"``, ``"csv.gz"`` or ``"parquet"``.
+    """
+    raw = tempfile.TemporaryFile(buffering=0)
+    buffered = io.BufferedWriter(raw)
+    write_export(chunks, fmt, buffered)
+    buffered.flush()
+    buffered.detach()
+    raw.seek(0)
+    return raw
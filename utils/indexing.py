@@ -0,0 +1,719 @@
+"""Precomputed row indexes for resolving sidebar filters."""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Hashable, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.buffers import AppendBuffer
+
+
+INDEXED_COLUMNS = [
+    "facility_name",
+    "spend_category",
+    "vendor_name",
+    "contract_type",
+    "ppi_flag",
+]
+
+
+def day_ordinal(value: date) -> int:
+    """Return a date as days since 1970-01-01."""
+    return int(np.datetime64(value, "D").astype(np.int64))
+
+
+def day_ordinals(dates: pd.Series) -> np.ndarray:
+    """Return a datetime column as int32 days since 1970-01-01."""
+    return (
+        dates.to_numpy(dtype="datetime64[ns]")
+        .astype("datetime64[D]")
+        .astype(np.int32)
+    )
+
+
+def date_slice(days: np.ndarray, start: date, end: date) -> slice:
+    """Find the rows dated within ``[start, end]`` by binary search.
+
+    Args:
+        days: Sorted day ordinals, one per row.
+        start: First day of the range (inclusive).
+        end: Last day of the range (inclusive).
+
+    Returns:
+        Slice of the contiguous row positions inside the range.
+    """
+    lo = int(np.searchsorted(days, day_ordinal(start), side="left"))
+    hi = int(np.searchsorted(days, day_ordinal(end), side="right"))
+    return slice(lo, max(lo, hi))
+
+
+def filter_predicates(
+    facilities: Optional[list[str]] = None,
+    categories: Optional[list[str]] = None,
+    vendors: Optional[list[str]] = None,
+    contract_types: Optional[list[str]] = None,
+    ppi_only: bool = False,
+) -> list[tuple[str, list]]:
+    """Return the set dimension filters as (column, values) pairs."""
+    return [
+        (column, list(values))
+        for column, values in (
+            ("facility_name", facilities),
+            ("spend_category", categories),
+            ("vendor_name", vendors),
+            ("contract_type", contract_types),
+            ("ppi_flag", [True] if ppi_only else None),
+        )
+        if values
+    ]
+
+
+@dataclass
+class FilterStats:
+    """Row counts per value of each filter dimension.
+
+    Collected once when the data is loaded and used to estimate how
+    many rows a predicate keeps, so the most selective predicate can
+    be evaluated first.
+
+    Attributes:
+        n_rows: Row count the counts were taken over.
+        counts: Column name -> value -> number of rows.
+    """
+
+    n_rows: int
+    counts: dict[str, dict[Hashable, int]]
+
+    @classmethod
+    def build(cls, df: pd.DataFrame) -> FilterStats:
+        """Count the values of ``INDEXED_COLUMNS`` in a frame."""
+        counts = {}
+        for col in INDEXED_COLUMNS:
+            value_counts = df[col].value_counts(sort=False)
+            counts[col] = {
+                value: int(count)
+                for value, count in value_counts.items()
+                if count
+            }
+        return cls(n_rows=len(df), counts=counts)
+
+    def merge(self, other: FilterStats) -> FilterStats:
+        """Return the counts over both frames' rows."""
+        counts = {}
+        for col in INDEXED_COLUMNS:
+            merged = dict(self.counts.get(col, {}))
+            for value, count in other.counts.get(col, {}).items():
+                merged[value] = merged.get(value, 0) + count
+            counts[col] = merged
+        return FilterStats(n_rows=self.n_rows + other.n_rows, counts=counts)
+
+    def selectivity(self, column: str, values: Iterable[Hashable]) -> float:
+        """Estimate the fraction of rows whose ``column`` is in ``values``.
+
+        Unknown columns are assumed to keep every row.
+        """
+        by_value = self.counts.get(column)
+        if by_value is None or self.n_rows == 0:
+            return 1.0
+        matched = sum(by_value.get(value, 0) for value in set(values))
+        return matched / self.n_rows
+
+    def plan(
+        self, predicates: list[tuple[str, list]]
+    ) -> list[tuple[str, list]]:
+        """Order predicates from most to least selective.
+
+        Args:
+            predicates: (column, values) pairs, e.g. from
+                ``filter_predicates``.
+
+        Returns:
+            The same pairs, those expected to keep the fewest rows
+            first; ties keep their original order.
+        """
+        return sorted(
+            predicates, key=lambda item: self.selectivity(*item)
+        )
+
+
+def _pack(mask: np.ndarray) -> np.ndarray:
+    """Pack a boolean row mask into a bitmap of ceil(n / 8) bytes."""
+    return np.packbits(mask)
+
+
+def _unpack(bitmap: np.ndarray, n_rows: int) -> np.ndarray:
+    """Unpack a bitmap into a boolean row mask of length ``n_rows``."""
+    return np.unpackbits(bitmap, count=n_rows).view(bool)
+
+
+@dataclass
+class FilterIndex:
+    """Packed row bitmaps for every value of each filter dimension.
+
+    Each bitmap holds one bit per row of the indexed frame, so a
+    dimension costs ``n_rows / 8`` bytes per distinct value. Filters
+    are resolved with byte-wise OR within a dimension and AND across
+    dimensions instead of comparing row values.
+
+    The frame is expected to be sorted by ``transaction_date``, so a
+    date range maps to one contiguous block of rows found by binary
+    search over ``days``.
+
+    Bitmaps and ``days`` are views of ``AppendBuffer`` objects that
+    ``append`` extends in place, so indexes appended to one another
+    share their memory and each reads only its first ``n_rows`` bits.
+
+    Attributes:
+        n_rows: Row count of the frame the index was built from.
+        bitmaps: Column name -> value -> packed row bitmap.
+        days: Day ordinal of every row, ascending.
+        stats: Value counts used to order the bitmap combination.
+        buffers: Buffers behind ``days`` (key ``None``) and every
+            bitmap (key ``(column, value)``).
+    """
+
+    n_rows: int
+    bitmaps: dict[str, dict[Hashable, np.ndarray]]
+    days: np.ndarray
+    stats: Optional[FilterStats] = None
+    buffers: dict[Optional[tuple], AppendBuffer] = field(
+        default_factory=dict, repr=False, compare=False
+    )
+
+    @classmethod
+    def build(cls, df: pd.DataFrame) -> FilterIndex:
+        """Build the index over ``INDEXED_COLUMNS`` of a frame.
+
+        Args:
+            df: Frame whose row positions the bitmaps refer to.
+
+        Returns:
+            FilterIndex for ``df``.
+
+        Raises:
+            ValueError: If ``df`` is not sorted by ``transaction_date``.
+        """
+        days = day_ordinals(df["transaction_date"])
+        if len(days) and np.any(days[1:] < days[:-1]):
+            raise ValueError("Frame is not sorted by transaction_date")
+
+        buffers = {None: AppendBuffer(days)}
+        bitmaps: dict[str, dict[Hashable, np.ndarray]] = {}
+        counts: dict[str, dict[Hashable, int]] = {}
+        for col in INDEXED_COLUMNS:
+            codes, uniques = pd.factorize(df[col], sort=True)
+            values = uniques.tolist()
+            bitmaps[col] = {}
+            for code, value in enumerate(values):
+                buffer = AppendBuffer(_pack(codes == code))
+                buffers[col, value] = buffer
+                bitmaps[col][value] = buffer.view()
+            counts[col] = dict(
+                zip(
+                    values,
+                    np.bincount(codes[codes >= 0], minlength=len(values))
+                    .astype(int)
+                    .tolist(),
+                )
+            )
+        return cls(
+            n_rows=len(df),
+            bitmaps=bitmaps,
+            days=buffers[None].view(),
+            stats=FilterStats(n_rows=len(df), counts=counts),
+            buffers=buffers,
+        )
+
+    def append(self, df: pd.DataFrame) -> FilterIndex:
+        """Return a new index that also covers rows appended after it.
+
+        Only the new rows are scanned and written. The last, partly
+        filled byte of each bitmap is re-packed together with the new
+        rows' bits and written over in place: older indexes ignore
+        bits past their own ``n_rows``, so they are unaffected. Values
+        first seen in ``df`` get a bitmap that is zero over the
+        existing rows. Appending to an index that has already been
+        appended to copies its buffers first.
+
+        Args:
+            df: Rows that follow the indexed frame, sorted by
+                ``transaction_date`` and dated no earlier than its
+                last row.
+
+        Returns:
+            FilterIndex over the indexed rows followed by ``df``.
+
+        Raises:
+            ValueError: If ``df`` is unsorted or starts before the
+                last indexed day.
+        """
+        days = day_ordinals(df["transaction_date"])
+        if len(days) and np.any(days[1:] < days[:-1]):
+            raise ValueError("Frame is not sorted by transaction_date")
+        if len(days) and len(self.days) and days[0] < self.days[-1]:
+            raise ValueError("Appended rows start before the indexed rows")
+
+        buffers = dict(self.buffers)
+        days_buffer = buffers.get(None)
+        # Indexes whose row counts round to the same byte share their
+        # last byte, so only the newest index may write it in place;
+        # ``days`` holds one item per row and tells which that is.
+        if days_buffer is None or len(days_buffer) != self.n_rows:
+            buffers = {None: AppendBuffer(self.days)}
+            for col, by_value in self.bitmaps.items():
+                for value, bitmap in by_value.items():
+                    buffers[col, value] = AppendBuffer(bitmap)
+
+        n_rows = self.n_rows + len(df)
+        full_bytes, tail_bits = divmod(self.n_rows, 8)
+        n_bytes = (self.n_rows + 7) // 8
+        bitmaps: dict[str, dict[Hashable, np.ndarray]] = {}
+        for col in INDEXED_COLUMNS:
+            codes, uniques = pd.factorize(df[col], sort=True)
+            new_codes = dict(zip(uniques.tolist(), range(len(uniques))))
+            for value in new_codes:
+                if (col, value) not in buffers:
+                    buffers[col, value] = AppendBuffer(
+                        np.zeros(n_bytes, dtype=np.uint8)
+                    )
+
+            bitmaps[col] = {}
+            known = self.bitmaps.get(col, {})
+            for value in [*known, *(v for v in new_codes if v not in known)]:
+                code = new_codes.get(value)
+                added = (
+                    codes == code
+                    if code is not None
+                    else np.zeros(len(df), dtype=bool)
+                )
+                buffer = buffers[col, value]
+                tail = _unpack(buffer.view(n_bytes)[full_bytes:], tail_bits)
+                buffer = buffer.extend(
+                    n_bytes,
+                    _pack(np.concatenate([tail, added])),
+                    start=full_bytes,
+                )
+                buffers[col, value] = buffer
+                bitmaps[col][value] = buffer.view((n_rows + 7) // 8)
+        buffers[None] = buffers[None].extend(self.n_rows, days)
+        stats = FilterStats.build(df)
+        return FilterIndex(
+            n_rows=n_rows,
+            bitmaps=bitmaps,
+            days=buffers[None].view(n_rows),
+            stats=self.stats.merge(stats) if self.stats else stats,
+            buffers=buffers,
+        )
+
+    def date_slice(self, start: date, end: date) -> slice:
+        """Return the row block dated within ``[start, end]``."""
+        return date_slice(self.days, start, end)
+
+    def rows(
+        self,
+        date_range: Optional[tuple[date, date]] = None,
+        facilities: Optional[list[str]] = None,
+        categories: Optional[list[str]] = None,
+        vendors: Optional[list[str]] = None,
+        contract_types: Optional[list[str]] = None,
+        ppi_only: bool = False,
+    ) -> slice | np.ndarray:
+        """Resolve a full sidebar selection to row positions.
+
+        Args:
+            date_range: Tuple of (start_date, end_date).
+            facilities: Selected facility names.
+            categories: Selected spend categories.
+            vendors: Selected vendor names.
+            contract_types: Selected contract types.
+            ppi_only: If True, keep PPI items only.
+
+        Returns:
+            A slice when only the date range restricts the rows,
+            otherwise a sorted int64 array of row positions.
+        """
+        block = (
+            self.date_slice(*date_range)
+            if date_range is not None
+            else slice(0, self.n_rows)
+        )
+        positions = self.resolve(
+            facilities=facilities,
+            categories=categories,
+            vendors=vendors,
+            contract_types=contract_types,
+            ppi_only=ppi_only,
+            rows=block,
+        )
+        return block if positions is None else positions
+
+    def _row_bounds(self, rows: Optional[slice]) -> tuple[int, int]:
+        """Return the row bounds of ``rows`` clipped to the index."""
+        if rows is None:
+            return 0, self.n_rows
+        lo, hi, _ = rows.indices(self.n_rows)
+        return lo, max(lo, hi)
+
+    def select(
+        self,
+        column: str,
+        values: Iterable[Hashable],
+        rows: Optional[slice] = None,
+    ) -> Optional[np.ndarray]:
+        """Return the bitmap of rows whose ``column`` is in ``values``.
+
+        When more than half of the dimension's values are selected the
+        complement is OR-ed and inverted instead, so the work follows
+        whichever side of the selection is smaller.
+
+        Args:
+            column: Indexed column name.
+            values: Selected values.
+            rows: Contiguous row block to cover. The returned bitmap
+                starts at the byte holding the block's first row.
+
+        Returns:
+            Packed bitmap, or None if every value is selected (the
+            dimension does not restrict anything).
+        """
+        by_value = self.bitmaps[column]
+        wanted = set(values)
+        selected = [v for v in by_value if v in wanted]
+        if len(selected) == len(by_value):
+            return None
+
+        lo, hi = self._row_bounds(rows)
+        covered = slice(lo // 8, (hi + 7) // 8)
+        result = np.zeros(covered.stop - covered.start, dtype=np.uint8)
+        if len(selected) * 2 <= len(by_value):
+            for value in selected:
+                np.bitwise_or(result, by_value[value][covered], out=result)
+            return result
+
+        for value, bitmap in by_value.items():
+            if value not in wanted:
+                np.bitwise_or(result, bitmap[covered], out=result)
+        np.invert(result, out=result)
+        return result
+
+    def resolve(
+        self,
+        facilities: Optional[list[str]] = None,
+        categories: Optional[list[str]] = None,
+        vendors: Optional[list[str]] = None,
+        contract_types: Optional[list[str]] = None,
+        ppi_only: bool = False,
+        rows: Optional[slice] = None,
+    ) -> Optional[np.ndarray]:
+        """Resolve dimension filters to matching row positions.
+
+        Args:
+            facilities: Selected facility names.
+            categories: Selected spend categories.
+            vendors: Selected vendor names.
+            contract_types: Selected contract types.
+            ppi_only: If True, keep PPI items only.
+            rows: Contiguous block to search, e.g. from
+                ``date_slice``. Only the bitmap bytes covering the
+                block are combined.
+
+        Returns:
+            Sorted int64 array of matching row positions, or None if
+            no dimension restricts the rows (every row in ``rows``
+            matches).
+        """
+        predicates = filter_predicates(
+            facilities, categories, vendors, contract_types, ppi_only
+        )
+        if self.stats is not None:
+            predicates = self.stats.plan(predicates)
+
+        combined: Optional[np.ndarray] = None
+        for column, values in predicates:
+            bitmap = self.select(column, values, rows)
+            if bitmap is None:
+                continue
+            if combined is None:
+                combined = bitmap
+            else:
+                np.bitwise_and(combined, bitmap, out=combined)
+            if not combined.any():
+                return np.empty(0, dtype=np.int64)
+
+        if combined is None:
+            return None
+        return self._positions(combined, rows)
+
+    def _positions(
+        self, combined: np.ndarray, rows: Optional[slice]
+    ) -> np.ndarray:
+        """Return the set rows of a bitmap covering the bytes of ``rows``."""
+        lo, hi = self._row_bounds(rows)
+        base = lo - lo % 8
+        mask = _unpack(combined, hi - base)[lo - base:]
+        return np.flatnonzero(mask) + lo
+
+
+class DimensionMasks:
+    """Reuses per-dimension bitmaps across consecutive selections.
+
+    Most reruns change a single sidebar widget. The bitmap of every
+    dimension is kept over the full index together with the values it
+    was built for, so only dimensions whose values changed are
+    recomputed; the date range only picks the bytes that are AND-ed.
+    Holds up to ``n_rows / 8`` bytes per filtered dimension.
+
+    Args:
+        index: Index the selections are resolved against.
+
+    Attributes:
+        index: The index the masks belong to.
+        recomputed: Dimensions rebuilt by the last ``rows`` call.
+    """
+
+    def __init__(self, index: FilterIndex) -> None:
+        self.index = index
+        self.recomputed: list[str] = []
+        self._masks: dict[
+            str, tuple[frozenset, Optional[np.ndarray]]
+        ] = {}
+
+    def _mask(self, column: str, values: list) -> Optional[np.ndarray]:
+        """Return the full-index bitmap for a predicate, reusing it."""
+        key = frozenset(values)
+        cached = self._masks.get(column)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        bitmap = self.index.select(column, values)
+        self._masks[column] = (key, bitmap)
+        self.recomputed.append(column)
+        return bitmap
+
+    def rows(
+        self,
+        date_range: Optional[tuple[date, date]] = None,
+        facilities: Optional[list[str]] = None,
+        categories: Optional[list[str]] = None,
+        vendors: Optional[list[str]] = None,
+        contract_types: Optional[list[str]] = None,
+        ppi_only: bool = False,
+    ) -> slice | np.ndarray:
+        """Resolve a selection like ``FilterIndex.rows``.
+
+        Args:
+            date_range: Tuple of (start_date, end_date).
+            facilities: Selected facility names.
+            categories: Selected spend categories.
+            vendors: Selected vendor names.
+            contract_types: Selected contract types.
+            ppi_only: If True, keep PPI items only.
+
+        Returns:
+            A slice when only the date range restricts the rows,
+            otherwise a sorted int64 array of row positions.
+        """
+        index = self.index
+        self.recomputed = []
+        block = (
+            index.date_slice(*date_range)
+            if date_range is not None
+            else slice(0, index.n_rows)
+        )
+        predicates = filter_predicates(
+            facilities, categories, vendors, contract_types, ppi_only
+        )
+        if index.stats is not None:
+            predicates = index.stats.plan(predicates)
+
+        lo, hi = index._row_bounds(block)
+        covered = slice(lo // 8, (hi + 7) // 8)
+        combined: Optional[np.ndarray] = None
+        for column, values in predicates:
+            bitmap = self._mask(column, values)
+            if bitmap is None:
+                continue
+            if combined is None:
+                combined = bitmap[covered].copy()
+            else:
+                np.bitwise_and(combined, bitmap[covered], out=combined)
+            if not combined.any():
+                return np.empty(0, dtype=np.int64)
+
+        if combined is None:
+            return block
+        return index._positions(combined, block)
+
+
+def _sort_keys(values: pd.Series) -> np.ndarray:
+    """Return integer or numeric keys that sort like ``values``.
+
+    Categoricals sort by label rather than by category order, which
+    is not alphabetical once categories are appended; missing values
+    sort last.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        label_rank = np.argsort(
+            np.argsort(values.cat.categories.astype(str), kind="stable")
+        )
+        codes = values.cat.codes.to_numpy()
+        return np.where(codes >= 0, label_rank[codes], len(label_rank))
+    if values.dtype.kind in "biufmM":
+        return values.to_numpy()
+    codes, uniques = pd.factorize(values, sort=True)
+    return np.where(codes >= 0, codes, len(uniques))
+
+
+def _merge_order(keys: np.ndarray, prior: np.ndarray) -> np.ndarray:
+    """Extend a stable order of the first rows to every row.
+
+    The rows after the first ``len(prior)`` are sorted on their own
+    and inserted after the prior rows with equal keys, which gives
+    the same result as a stable argsort over all of ``keys``.
+
+    Args:
+        keys: Sort keys of every row, from ``_sort_keys``.
+        prior: Stable order of the first ``len(prior)`` rows.
+
+    Returns:
+        Order of every row, in the dtype of ``prior``.
+    """
+    n_prior = len(prior)
+    added = np.argsort(keys[n_prior:], kind="stable") + n_prior
+    at = np.searchsorted(keys[prior], keys[added], side="right")
+    return np.insert(prior, at, added.astype(prior.dtype))
+
+
+class SortIndex:
+    """Row orders of a frame by each column, built on first use.
+
+    A column's order is one stable argsort over the whole frame, kept
+    as int32 positions (4 bytes per row and column sorted on). A page
+    of a selection is found by keeping the positions of that order
+    that are selected, which takes one linear pass instead of sorting
+    the selected rows. ``sorted_rows`` returns the whole sorted
+    selection so that callers can cache it and cut later pages from it
+    with ``page_of`` in O(page size). An index built by ``append``
+    merges the appended rows into the orders sorted before.
+
+    Args:
+        df: Frame the orders index.
+        inherited: Column -> order of a prefix of ``df``, from
+            ``append``.
+    """
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        inherited: Optional[dict[str, np.ndarray]] = None,
+    ) -> None:
+        self.df = df
+        self._orders: dict[str, np.ndarray] = {}
+        self._inherited = dict(inherited or {})
+
+    @property
+    def n_rows(self) -> int:
+        """Number of rows indexed."""
+        return len(self.df)
+
+    def append(self, df: pd.DataFrame) -> SortIndex:
+        """Return the index of ``df``, which extends this index's frame.
+
+        The orders already sorted here are handed on, and the new
+        index merges the appended rows into each on first use instead
+        of sorting every row again.
+
+        Args:
+            df: This index's frame followed by appended rows.
+
+        Returns:
+            SortIndex over ``df``.
+        """
+        return SortIndex(df, {**self._inherited, **self._orders})
+
+    def order(self, column: str) -> np.ndarray:
+        """Return the positions of every row sorted by ``column``."""
+        if column not in self._orders:
+            n = self.n_rows
+            dtype = np.int32 if n <= np.iinfo(np.int32).max else np.int64
+            values = self.df[column]
+            prior = self._inherited.pop(column, None)
+            if values.is_monotonic_increasing:
+                order = np.arange(n, dtype=dtype)
+            elif prior is not None:
+                order = _merge_order(
+                    _sort_keys(values), prior.astype(dtype, copy=False)
+                )
+            else:
+                order = np.argsort(
+                    _sort_keys(values), kind="stable"
+                ).astype(dtype)
+            self._orders[column] = order
+        return self._orders[column]
+
+    def sorted_rows(
+        self, column: str, rows: slice | np.ndarray
+    ) -> np.ndarray:
+        """Return the positions of a selection sorted by ``column``.
+
+        This is one linear pass over the column's order; callers that
+        page through the same selection should keep the result, so
+        each page is a slice of it.
+
+        Args:
+            column: Column to sort by.
+            rows: Selected positions (or slice), e.g. from
+                ``FilterIndex.rows``.
+
+        Returns:
+            Selected positions in ascending sort order. For the whole
+            frame this is the column's order itself, not a copy.
+        """
+        n = self.n_rows
+        order = self.order(column)
+        if isinstance(rows, slice) and rows.indices(n) == (0, n, 1):
+            return order
+        if isinstance(rows, slice):
+            lo, hi, _ = rows.indices(n)
+            hits = (order >= lo) & (order < hi)
+        else:
+            selected = np.zeros(n, dtype=bool)
+            selected[rows] = True
+            hits = selected[order]
+        return order[hits]
+
+    def page(
+        self,
+        column: str,
+        rows: slice | np.ndarray,
+        descending: bool,
+        offset: int,
+        limit: int,
+    ) -> np.ndarray:
+        """Return one page of a selection ordered by ``column``.
+
+        Args:
+            column: Column to sort by.
+            rows: Selected positions (or slice), e.g. from
+                ``FilterIndex.rows``.
+            descending: Sort largest first.
+            offset: Number of sorted rows to skip.
+            limit: Maximum number of positions to return.
+
+        Returns:
+            Positions of the page's rows, in sort order.
+        """
+        return page_of(
+            self.sorted_rows(column, rows), descending, offset, limit
+        )
+
+
+def page_of(
+    ordered: np.ndarray, descending: bool, offset: int, limit: int
+) -> np.ndarray:
+    """Return one page of positions from ``SortIndex.sorted_rows``."""
+    if descending:
+        ordered = ordered[::-1]
+    return ordered[offset : offset + limit]
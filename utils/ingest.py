@@ -0,0 +1,473 @@
+"""Incremental ingestion of spend data appended after startup."""
+from __future__ import annotations
+
+import hashlib
+import io
+import logging
+import threading
+import time
+from dataclasses import dataclass, replace
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.buffers import FrameBuffer
+from utils.cube import PrefixSums, build_cube
+from utils.data_processing import (
+    DATA_PATH,
+    DIMENSION_COLUMNS,
+    PARTITIONED_PATH,
+    Partition,
+    compact_schema,
+    list_partitions,
+    load_data,
+    prepare_rows,
+    prune_partitions,
+)
+from utils.indexing import FilterIndex, SortIndex
+from utils.sketches import DistinctSketches
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REFRESH_SECONDS = 60.0
+
+# Bytes hashed at each end of the part of a file already read.
+FINGERPRINT_BYTES = 4096
+
+# Columns whose compact dtype depends on the values they hold.
+_NUMERIC_COLUMNS = ["quantity", "unit_price", "total_amount"]
+
+
+@dataclass(frozen=True)
+class SpendSnapshot:
+    """The loaded rows together with every structure derived from them.
+
+    Snapshots are never modified; appending data produces a new one,
+    so a rerun that holds a snapshot sees a consistent set.
+
+    Appends are O(appended rows): ``df`` and ``cube`` are views of
+    ``FrameBuffer`` objects shared between snapshots, the filter
+    indexes and vendor sketches extend their buffers in place, and
+    the sort index merges the new rows into orders already sorted.
+    The cube is extended with the cube of each batch, so a cell dated
+    on a day two batches share appears twice; every consumer sums the
+    measures, so the totals are unchanged.
+
+    Attributes:
+        df: Transactions sorted by ``transaction_date``.
+        filter_index: FilterIndex over ``df``.
+        cube: Cube from ``build_cube`` over ``df``.
+        cube_index: FilterIndex over ``cube``.
+        prefix_sums: PrefixSums over ``cube``.
+        vendor_sketches: Distinct-vendor sketches over ``df``.
+        sort_index: Row orders of ``df`` for the Data Explorer.
+        version: Number of appends applied since the initial load.
+        frame_buffer: Buffers ``df`` is a view of.
+        cube_buffer: Buffers ``cube`` is a view of.
+    """
+
+    df: pd.DataFrame
+    filter_index: FilterIndex
+    cube: pd.DataFrame
+    cube_index: FilterIndex
+    prefix_sums: PrefixSums
+    vendor_sketches: DistinctSketches
+    sort_index: SortIndex
+    version: int
+    frame_buffer: FrameBuffer
+    cube_buffer: FrameBuffer
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, version: int = 0) -> SpendSnapshot:
+        """Build every derived structure from scratch."""
+        frame_buffer = FrameBuffer.from_frame(df)
+        cube_buffer = FrameBuffer.from_frame(build_cube(df))
+        df, cube = frame_buffer.frame, cube_buffer.frame
+        return cls(
+            df=df,
+            filter_index=FilterIndex.build(df),
+            cube=cube,
+            cube_index=FilterIndex.build(cube),
+            prefix_sums=PrefixSums.build(cube),
+            vendor_sketches=DistinctSketches.build(df),
+            sort_index=SortIndex(df),
+            version=version,
+            frame_buffer=frame_buffer,
+            cube_buffer=cube_buffer,
+        )
+
+    def append(self, delta: pd.DataFrame) -> SpendSnapshot:
+        """Return a snapshot with ``delta`` appended.
+
+        When ``delta`` starts on or after the last loaded day, only
+        ``delta`` is indexed and aggregated and the results are merged
+        into the existing structures. Back-dated rows break the date
+        order the indexes rely on, so they trigger a full rebuild.
+
+        Args:
+            delta: Validated, date-sorted rows in the schema of ``df``.
+
+        Returns:
+            New SpendSnapshot.
+        """
+        if delta.empty:
+            return self
+        dates = self.df["transaction_date"]
+        if len(dates) and delta["transaction_date"].iloc[0] < dates.iloc[-1]:
+            logger.info("Back-dated rows appended; rebuilding all indexes")
+            df = (
+                pd.concat([self.df, delta], ignore_index=True)
+                .sort_values("transaction_date", kind="stable")
+                .reset_index(drop=True)
+            )
+            return SpendSnapshot.build(df, version=self.version + 1)
+
+        delta = delta.reset_index(drop=True)
+        delta_cube = build_cube(delta)
+        frame_buffer = self.frame_buffer.append(delta)
+        cube_buffer = self.cube_buffer.append(delta_cube)
+        df = frame_buffer.frame
+        return SpendSnapshot(
+            df=df,
+            filter_index=self.filter_index.append(delta),
+            cube=cube_buffer.frame,
+            cube_index=self.cube_index.append(delta_cube),
+            prefix_sums=self.prefix_sums.append(delta_cube),
+            vendor_sketches=self.vendor_sketches.append(delta),
+            sort_index=self.sort_index.append(df),
+            version=self.version + 1,
+            frame_buffer=frame_buffer,
+            cube_buffer=cube_buffer,
+        )
+
+
+def _partition_window(
+    since: Optional[date],
+) -> Optional[tuple[date, date]]:
+    """Return the date range that loads every partition from ``since``."""
+    return (since, date.max) if since is not None else None
+
+
+def _source_files(since: Optional[date] = None) -> list[Path]:
+    """Return the files ``load_data`` reads from ``since``, in order."""
+    if PARTITIONED_PATH.is_dir():
+        partitions = prune_partitions(
+            list_partitions(PARTITIONED_PATH), _partition_window(since)
+        )
+        return [p.path for p in partitions]
+    return [DATA_PATH]
+
+
+@dataclass(frozen=True)
+class _ReadMark:
+    """How far a source file was read, and what it looked like then.
+
+    Attributes:
+        offset: Bytes read so far.
+        mtime_ns: Modification time when last checked.
+        fingerprint: ``_fingerprint`` of the first ``offset`` bytes.
+    """
+
+    offset: int
+    mtime_ns: int
+    fingerprint: str
+
+
+def _fingerprint(path: Path, offset: int) -> str:
+    """Hash the first and last ``FINGERPRINT_BYTES`` before ``offset``.
+
+    Appending leaves these bytes alone, so a different hash means the
+    file was rewritten rather than grown.
+    """
+    tail_start = max(offset - FINGERPRINT_BYTES, 0)
+    with path.open("rb") as fh:
+        head = fh.read(min(offset, FINGERPRINT_BYTES))
+        fh.seek(tail_start)
+        tail = fh.read(offset - tail_start)
+    return hashlib.sha1(head + b"\0" + tail).hexdigest()
+
+
+def _mark(path: Path, offset: int, mtime_ns: int) -> _ReadMark:
+    return _ReadMark(offset, mtime_ns, _fingerprint(path, offset))
+
+
+def _read_appended(path: Path, offset: int) -> tuple[pd.DataFrame, int]:
+    """Read the complete CSV lines written after byte ``offset``.
+
+    A trailing line without a newline may still be being written, so
+    it is left for the next read.
+
+    Returns:
+        Tuple of (raw rows, offset just past the last line read).
+    """
+    with path.open("rb") as fh:
+        header = fh.readline()
+        fh.seek(max(offset, len(header)))
+        data = fh.read()
+    complete = data.rfind(b"\n") + 1
+    if complete == 0:
+        return pd.DataFrame(), max(offset, len(header))
+    rows = pd.read_csv(
+        io.BytesIO(header + data[:complete]),
+        parse_dates=["transaction_date"],
+    )
+    return rows, max(offset, len(header)) + complete
+
+
+class SpendStore:
+    """In-memory spend data that picks up appended rows incrementally.
+
+    The store remembers how many bytes of every source file it has
+    read, with a fingerprint of those bytes. ``refresh`` reads only
+    bytes written since, from the CSV or from new and grown partition
+    CSVs, validates them and appends them to the current snapshot. A
+    shrunk, removed or rewritten file (one whose fingerprint no longer
+    matches) cannot be handled incrementally and triggers a full
+    reload.
+
+    A partitioned dataset can be loaded from a window: only the
+    months from ``since`` on are read and watched, and ``widen``
+    reloads from an earlier day when a selection needs one. The window
+    never shrinks, so moving between selections does not reload each
+    time. A single CSV is always loaded whole.
+
+    Args:
+        compact: Whether to hold the compact schema.
+        refresh_seconds: Minimum interval between file checks.
+        window_days: Load about the latest ``window_days`` days of a
+            partitioned dataset, and as many before them for prior
+            period comparisons, counted back from the first day of
+            the latest month; None loads everything.
+    """
+
+    def __init__(
+        self,
+        compact: bool = False,
+        refresh_seconds: float = DEFAULT_REFRESH_SECONDS,
+        window_days: Optional[int] = None,
+    ) -> None:
+        self.compact = compact
+        self.refresh_seconds = refresh_seconds
+        self.since: Optional[date] = None
+        if window_days and PARTITIONED_PATH.is_dir():
+            months = [p.month for p in list_partitions(PARTITIONED_PATH)]
+            if months:
+                self.since = max(months) - timedelta(days=2 * window_days)
+        self._lock = threading.Lock()
+        self._marks: dict[Path, _ReadMark] = {}
+        self._stale = False
+        self._checked_at = 0.0
+        self.snapshot = self._load()
+
+    def partitions(self) -> list[Partition]:
+        """Return every partition of the dataset, loaded or not."""
+        if PARTITIONED_PATH.is_dir():
+            return list_partitions(PARTITIONED_PATH)
+        return []
+
+    def covers(self, since: Optional[date]) -> bool:
+        """Return whether every row from ``since`` (None: all) is loaded."""
+        if self.since is None:
+            return True
+        return since is not None and since >= self.since
+
+    def widen(self, since: Optional[date]) -> bool:
+        """Reload from ``since`` (None: everything) unless covered.
+
+        Returns:
+            Whether the data were reloaded.
+        """
+        with self._lock:
+            if self.covers(since):
+                return False
+            months = [p.month for p in self.partitions()]
+            if since is not None and months and since <= min(months):
+                # Nothing is older, so later selections never reload.
+                since = None
+            self.since = since
+            logger.info(
+                "Widening the loaded window to start at %s",
+                since or "the first partition",
+            )
+            self.snapshot = self._load(self.snapshot.version + 1)
+            return True
+
+    def _file_stats(self) -> dict[Path, tuple[int, int]]:
+        """Return (size, mtime in ns) of every existing source file."""
+        stats = {}
+        for path in _source_files(self.since):
+            if path.exists():
+                stat = path.stat()
+                stats[path] = (stat.st_size, stat.st_mtime_ns)
+        return stats
+
+    def _load(self, version: int = 0) -> SpendSnapshot:
+        """Load the window's files and record how far each was read.
+
+        Args:
+            version: Version of the new snapshot; reloads continue the
+                numbering so cached views of older data are not reused.
+        """
+        stats = self._file_stats()
+        load_data.clear()
+        df = load_data(
+            compact=self.compact, date_range=_partition_window(self.since)
+        )
+        # Written to while loading: the sizes no longer say which rows
+        # were read, so the next refresh reloads everything.
+        self._stale = self._file_stats() != stats
+        self._marks = {
+            path: _mark(path, size, mtime_ns)
+            for path, (size, mtime_ns) in stats.items()
+        }
+        self._checked_at = time.monotonic()
+        return SpendSnapshot.build(df, version=version)
+
+    def _rewritten(self, stats: dict[Path, tuple[int, int]]) -> bool:
+        """Return whether any file changed other than by appending."""
+        if self._stale:
+            return True
+        for path, mark in self._marks.items():
+            if path not in stats:
+                return True
+            size, mtime_ns = stats[path]
+            if size < mark.offset:
+                return True
+            if size == mark.offset and mtime_ns == mark.mtime_ns:
+                continue
+            if path.suffix == ".parquet":
+                return True
+            if _fingerprint(path, mark.offset) != mark.fingerprint:
+                return True
+        return False
+
+    def _encode(
+        self, delta: pd.DataFrame
+    ) -> tuple[SpendSnapshot, pd.DataFrame]:
+        """Bring validated rows and the snapshot to a common schema.
+
+        In compact mode the dimension dictionary is extended with any
+        new values, after the existing ones, so appending the rows
+        keeps every loaded code.
+
+        Numeric rows take the snapshot's dtypes, so a batch is never
+        narrowed (e.g. to float32) where the loaded data was not. If
+        the batch does not fit those dtypes, the snapshot's column is
+        widened instead; only that column is copied.
+
+        Returns:
+            Tuple of (snapshot to append to, encoded rows).
+        """
+        snapshot = self.snapshot
+        if not self.compact:
+            return snapshot, delta
+        dictionary = {
+            col: snapshot.df[col].dtype for col in DIMENSION_COLUMNS
+        }
+        typed = delta
+        delta = compact_schema(delta, dictionary)
+        widened = {}
+        for col in _NUMERIC_COLUMNS:
+            dtype = np.promote_types(
+                snapshot.df[col].dtype, delta[col].dtype
+            )
+            delta[col] = typed[col].astype(dtype)
+            if snapshot.df[col].dtype != dtype:
+                widened[col] = snapshot.df[col].astype(dtype)
+                if dtype.kind == "f":
+                    # float32 dollars are exact only to the cent.
+                    widened[col] = widened[col].round(2)
+        if widened:
+            frame_buffer = snapshot.frame_buffer.with_columns(**widened)
+            snapshot = replace(
+                snapshot, df=frame_buffer.frame, frame_buffer=frame_buffer
+            )
+        return snapshot, delta
+
+    def refresh(self, force: bool = False) -> int:
+        """Ingest rows written since the last check.
+
+        Args:
+            force: Check the files even if ``refresh_seconds`` has
+                not passed since the last check.
+
+        Returns:
+            Number of rows appended (all rows after a full reload).
+
+        Raises:
+            ValueError: If the new rows fail validation; they are not
+                ingested and are read again on the next refresh.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._checked_at < self.refresh_seconds:
+                return 0
+            self._checked_at = now
+
+            stats = self._file_stats()
+            if self._rewritten(stats):
+                logger.info("Source files were rewritten; reloading")
+                self.snapshot = self._load(self.snapshot.version + 1)
+                return len(self.snapshot.df)
+
+            marks = dict(self._marks)
+            frames = []
+            for path, (size, mtime_ns) in stats.items():
+                offset = marks[path].offset if path in marks else 0
+                if size == offset:
+                    if path in marks:
+                        marks[path] = replace(marks[path], mtime_ns=mtime_ns)
+                    continue
+                if path.suffix == ".parquet":
+                    frames.append(pd.read_parquet(path))
+                    offset = size
+                else:
+                    rows, offset = _read_appended(path, offset)
+                    frames.append(rows)
+                marks[path] = _mark(path, offset, mtime_ns)
+            frames = [frame for frame in frames if not frame.empty]
+            if not frames:
+                self._marks = marks
+                return 0
+
+            started = time.perf_counter()
+            snapshot, delta = self._encode(
+                prepare_rows(pd.concat(frames, ignore_index=True))
+            )
+            self.snapshot = snapshot.append(delta)
+            self._marks = marks
+            logger.info(
+                "Appended %d rows in %.3f s",
+                len(delta),
+                time.perf_counter() - started,
+            )
+            return len(delta)
+
+
+@st.cache_resource
+def load_store(
+    compact: bool = False,
+    refresh_seconds: float = DEFAULT_REFRESH_SECONDS,
+    window_days: Optional[int] = None,
+) -> SpendStore:
+    """Return the process-wide store, loading the data on first use.
+
+    Args:
+        compact: Whether to hold the compact schema.
+        refresh_seconds: Minimum interval between file checks.
+        window_days: Days of a partitioned dataset to load at first;
+            see ``SpendStore``.
+
+    Returns:
+        Shared SpendStore; call ``refresh`` to pick up new rows and
+        ``widen`` before answering a selection outside its window.
+    """
+    return SpendStore(
+        compact=compact,
+        refresh_seconds=refresh_seconds,
+        window_days=window_days,
+    )
@@ -0,0 +1,224 @@
+"""Per-rerun timing of dashboard stages.
+
+``start_run`` begins recording for the current script run. Functions
+decorated with ``timed`` and blocks wrapped in ``stage`` then add one
+``StageRecord`` each to that run; outside a run they cost a single
+context-variable lookup and record nothing.
+"""
+from __future__ import annotations
+
+import functools
+import json
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def configure_perf_log(enabled: bool = True) -> None:
+    """Write the stage log lines to stderr as bare JSON, or drop them.
+
+    The logger gets its own handler at INFO and does not propagate,
+    so the lines are emitted even where the root logger passes only
+    warnings (as under ``streamlit run``) and are not reformatted by
+    other handlers. Safe to call on every rerun.
+
+    Args:
+        enabled: Whether ``RunProfile.log`` lines are emitted.
+    """
+    logger.setLevel(logging.INFO if enabled else logging.WARNING)
+    logger.propagate = False
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+
+
+@dataclass
+class StageRecord:
+    """Timing of one stage of a rerun.
+
+    Attributes:
+        stage: Stage name, e.g. the function name.
+        depth: Nesting level; stages run inside another stage are
+            one deeper than it.
+        seconds: Wall-clock duration.
+        rows: Rows the stage worked on, when known.
+        cache_hit: Whether the result came from a cache, for stages
+            that are cached; None otherwise.
+    """
+
+    stage: str
+    depth: int = 0
+    seconds: float = 0.0
+    rows: Optional[int] = None
+    cache_hit: Optional[bool] = None
+
+
+@dataclass
+class RunProfile:
+    """Stage timings collected over one script run.
+
+    Attributes:
+        run_id: Identifier shared by the run's log lines.
+        records: Stages in the order they started.
+    """
+
+    run_id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    records: list[StageRecord] = field(default_factory=list)
+    started_at: float = field(default_factory=time.perf_counter)
+    _open: list[StageRecord] = field(default_factory=list, repr=False)
+
+    @property
+    def total_seconds(self) -> float:
+        """Time since the run started."""
+        return time.perf_counter() - self.started_at
+
+    def to_frame(self) -> pd.DataFrame:
+        """Return the records as a frame, one row per stage."""
+        return pd.DataFrame(
+            [asdict(record) for record in self.records],
+            columns=["stage", "depth", "seconds", "rows", "cache_hit"],
+        ).astype({"rows": "Int64", "cache_hit": "boolean"})
+
+    def log(self) -> None:
+        """Emit one JSON log line per stage and one for the whole run.
+
+        The lines go to this module's logger at INFO; see
+        ``configure_perf_log``.
+        """
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        for record in self.records:
+            logger.info(
+                json.dumps(
+                    {"event": "stage", "run_id": self.run_id, **asdict(record)}
+                )
+            )
+        logger.info(
+            json.dumps(
+                {
+                    "event": "run",
+                    "run_id": self.run_id,
+                    "seconds": self.total_seconds,
+                    "stages": len(self.records),
+                }
+            )
+        )
+
+
+_current_run: ContextVar[Optional[RunProfile]] = ContextVar(
+    "current_run", default=None
+)
+
+
+def start_run() -> RunProfile:
+    """Begin recording stages for the current script run."""
+    profile = RunProfile()
+    _current_run.set(profile)
+    return profile
+
+
+def current_run() -> Optional[RunProfile]:
+    """Return the run being recorded, if any."""
+    return _current_run.get()
+
+
+def row_count(value: Any) -> Optional[int]:
+    """Return the number of rows in a frame, array or slice of rows."""
+    if isinstance(value, (pd.DataFrame, pd.Series, np.ndarray)):
+        if isinstance(value, np.ndarray) and value.dtype == bool:
+            return int(np.count_nonzero(value))
+        return len(value)
+    if isinstance(value, slice) and value.stop is not None:
+        return max(value.stop - (value.start or 0), 0)
+    return None
+
+
+@contextmanager
+def stage(name: str, rows: Optional[int] = None) -> Iterator[StageRecord]:
+    """Time the enclosed block as one stage of the current run.
+
+    The yielded record may be updated inside the block, e.g. to set
+    ``rows`` or ``cache_hit`` once they are known.
+    """
+    profile = _current_run.get()
+    record = StageRecord(stage=name, rows=rows)
+    if profile is None:
+        yield record
+        return
+    record.depth = len(profile._open)
+    profile.records.append(record)
+    profile._open.append(record)
+    started = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record.seconds = time.perf_counter() - started
+        profile._open.pop()
+
+
+def mark_computed() -> None:
+    """Record that the innermost open stage missed its cache."""
+    profile = _current_run.get()
+    if profile is not None and profile._open:
+        profile._open[-1].cache_hit = False
+
+
+def timed(
+    name: Optional[str] = None,
+    cache: Optional[Callable[[Callable], Callable]] = None,
+) -> Callable[[Callable], Callable]:
+    """Decorate a function so each call is recorded as a stage.
+
+    The stage's ``rows`` is the row count of the result or, if that
+    has none (e.g. a KPI dictionary), of the first argument.
+
+    Args:
+        name: Stage name; the function's name if omitted.
+        cache: Caching decorator (e.g. ``st.cache_data``) to apply
+            beneath the timing, so hits and misses are told apart.
+            Its ``clear`` method is kept on the returned function.
+
+    Returns:
+        Decorator.
+    """
+
+    def decorate(fn: Callable) -> Callable:
+        label = name or fn.__name__
+        inner = fn
+        if cache is not None:
+
+            @functools.wraps(fn)
+            def compute(*args, **kwargs):
+                mark_computed()
+                return fn(*args, **kwargs)
+
+            inner = cache(compute)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _current_run.get() is None:
+                return inner(*args, **kwargs)
+            with stage(label) as record:
+                if cache is not None:
+                    record.cache_hit = True
+                result = inner(*args, **kwargs)
+                record.rows = row_count(result)
+                if record.rows is None and args:
+                    record.rows = row_count(args[0])
+            return result
+
+        if hasattr(inner, "clear"):
+            wrapper.clear = inner.clear
+        return wrapper
+
+    return decorate
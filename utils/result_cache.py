@@ -0,0 +1,185 @@
+"""LRU cache of computed dashboard views keyed by filter selection."""
+from __future__ import annotations
+
+import pickle
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Callable, Hashable, Optional
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def filter_signature(
+    date_range: Optional[tuple[date, date]] = None,
+    facilities: Optional[list[str]] = None,
+    categories: Optional[list[str]] = None,
+    vendors: Optional[list[str]] = None,
+    contract_types: Optional[list[str]] = None,
+    ppi_only: bool = False,
+) -> tuple:
+    """Normalise a sidebar selection into a hashable cache key.
+
+    Selections are sorted and de-duplicated so the order in which
+    values were picked does not matter, and None and an empty list
+    (both meaning "no filter") map to the same key.
+
+    Args:
+        date_range: Tuple of (start_date, end_date).
+        facilities: Selected facility names.
+        categories: Selected spend categories.
+        vendors: Selected vendor names.
+        contract_types: Selected contract types.
+        ppi_only: If True, PPI items only.
+
+    Returns:
+        Tuple usable as a dictionary key.
+    """
+    def _values(selected: Optional[list[str]]) -> tuple[str, ...]:
+        return tuple(sorted(set(selected or ())))
+
+    dates = (
+        (date_range[0].isoformat(), date_range[1].isoformat())
+        if date_range is not None
+        else None
+    )
+    return (
+        dates,
+        _values(facilities),
+        _values(categories),
+        _values(vendors),
+        _values(contract_types),
+        bool(ppi_only),
+    )
+
+
+def estimate_nbytes(obj: Any) -> int:
+    """Estimate the memory held by a cached value.
+
+    Arrays and frames report their buffer sizes, containers are summed
+    recursively, and anything else (e.g. Plotly figures) is measured
+    by its pickled size.
+    """
+    if obj is None or isinstance(obj, (bool, int, float, str, slice)):
+        return 64
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        usage = obj.memory_usage(index=True, deep=True)
+        return int(usage.sum() if isinstance(obj, pd.DataFrame) else usage)
+    if isinstance(obj, dict):
+        return 64 + sum(
+            estimate_nbytes(k) + estimate_nbytes(v) for k, v in obj.items()
+        )
+    if isinstance(obj, (list, tuple)):
+        return 64 + sum(estimate_nbytes(v) for v in obj)
+    try:
+        return len(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+    except (pickle.PicklingError, TypeError, AttributeError):
+        return 1024
+
+
+class ResultCache:
+    """Thread-safe LRU cache bounded by an estimated byte budget.
+
+    Entries are evicted least-recently-used first until the total
+    estimated size fits ``max_bytes``. An entry larger than the whole
+    budget is not stored.
+
+    Attributes:
+        max_bytes: Byte budget for all entries.
+        hits: Number of lookups served from the cache.
+        misses: Number of lookups that found nothing.
+        evictions: Number of entries dropped to stay within budget.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[Hashable, tuple[Any, int]] = (
+            OrderedDict()
+        )
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    @property
+    def nbytes(self) -> int:
+        """Estimated bytes held by all entries."""
+        return self._nbytes
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value for ``key`` and mark it recent."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Store ``value`` (re-measuring it if ``key`` already exists)."""
+        size = estimate_nbytes(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._nbytes -= old[1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self._nbytes += size
+            while self._nbytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._nbytes -= evicted
+                self.evictions += 1
+
+    def get_or_compute(
+        self, key: Hashable, compute: Callable[[], Any]
+    ) -> Any:
+        """Return the cached value, computing and storing it on a miss."""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        """Drop every entry; the counters are kept."""
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+
+    def stats(self) -> dict:
+        """Return entry count, size, budget and hit/miss counters."""
+        return {
+            "entries": len(self._entries),
+            "nbytes": self._nbytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+@st.cache_resource
+def load_result_cache(max_bytes: int = DEFAULT_MAX_BYTES) -> ResultCache:
+    """Return the process-wide result cache for the given budget.
+
+    Views depend only on the filter selection, so one cache is shared
+    by every session.
+    """
+    return ResultCache(max_bytes=max_bytes)
@@ -0,0 +1,518 @@
+"""Optional embedded SQL backend for filtering and aggregation.
+
+Uses DuckDB when it is installed and falls back to the standard
+library's SQLite otherwise. The data lives in an on-disk database, so
+queries are answered without holding the transactions in memory.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import weakref
+from collections import Counter
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+import pandas as pd
+import streamlit as st
+
+from utils.aggregations import BASE_KEYS, AggregationContext
+from utils.data_processing import (
+    CACHE_DIR,
+    CACHE_VERSION,
+    DATA_PATH,
+    EXPECTED_COLUMNS,
+    PARTITIONED_PATH,
+    kpis_from_totals,
+    list_partitions,
+    prepare_rows,
+)
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+TABLE = "spend"
+LOAD_CHUNK_ROWS = 250_000
+DEFAULT_REFRESH_SECONDS = 60.0
+
+
+def _source_files() -> list[Path]:
+    """Return the files holding the spend data, in load order."""
+    if PARTITIONED_PATH.is_dir():
+        return [p.path for p in list_partitions(PARTITIONED_PATH)]
+    if not DATA_PATH.exists():
+        raise FileNotFoundError(f"Data file not found: {DATA_PATH}")
+    return [DATA_PATH]
+
+
+def _database_path(files: list[Path], suffix: str) -> Path:
+    """Return the database file for the current version of ``files``."""
+    fingerprint = f"{CACHE_VERSION}:" + ";".join(
+        f"{path.resolve()}:{path.stat().st_size}:{path.stat().st_mtime_ns}"
+        for path in files
+    )
+    digest = hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()[:16]
+    return CACHE_DIR / f"{TABLE}-{digest}.{suffix}"
+
+
+# Database files with an open connection in this process.
+_open_databases: Counter[Path] = Counter()
+_open_lock = threading.Lock()
+
+
+def _unlink_database(path: Path) -> None:
+    """Delete a database file and its DuckDB write-ahead log.
+
+    Failures are swallowed, like stale Parquet caches in
+    ``_write_cache``: a file another process still has open (on
+    Windows) is simply left for a later build to remove.
+    """
+    for file in (path, path.with_name(f"{path.name}.wal")):
+        try:
+            file.unlink(missing_ok=True)
+        except OSError:
+            pass
+
+
+def _remove_stale_databases(current: Path) -> None:
+    """Delete databases built for earlier versions of the data.
+
+    Databases a backend in this process still has open are kept; they
+    are deleted when that backend is released (see ``retire``).
+    """
+    engine = current.suffix.lstrip(".")
+    with _open_lock:
+        in_use = set(_open_databases)
+    for stale in current.parent.glob(f"{TABLE}-*.{engine}"):
+        if stale != current and stale not in in_use:
+            _unlink_database(stale)
+
+
+def _release(con: Any, path: Path, retired: threading.Event) -> None:
+    """Close a backend's connection; delete its file if superseded."""
+    con.close()
+    with _open_lock:
+        _open_databases[path] -= 1
+        in_use = _open_databases[path] > 0
+        if not in_use:
+            del _open_databases[path]
+    if retired.is_set() and not in_use:
+        _unlink_database(path)
+
+
+def _read_chunks(path: Path):
+    """Yield validated frames of at most ``LOAD_CHUNK_ROWS`` rows."""
+    if path.suffix == ".parquet":
+        yield prepare_rows(pd.read_parquet(path))
+        return
+    for chunk in pd.read_csv(
+        path, parse_dates=["transaction_date"], chunksize=LOAD_CHUNK_ROWS
+    ):
+        yield prepare_rows(chunk)
+
+
+def _decode_rows(rows: pd.DataFrame) -> pd.DataFrame:
+    """Restore the date and flag types of rows read back from SQL."""
+    rows["transaction_date"] = pd.to_datetime(rows["transaction_date"])
+    rows["ppi_flag"] = rows["ppi_flag"].astype(bool)
+    return rows
+
+
+class SqlBackend:
+    """Spend data in an embedded SQL database.
+
+    Every method takes the sidebar filters as keyword arguments
+    (``date_range``, ``facilities``, ``categories``, ``vendors``,
+    ``contract_types``, ``ppi_only``) and pushes them down as a
+    ``WHERE`` clause, so only aggregates or the selected rows come
+    back to pandas. Queries are serialised with a lock because the
+    connection is shared across Streamlit sessions.
+
+    The connection is closed by ``close`` or, failing that, when the
+    backend is garbage-collected.
+
+    Args:
+        path: Database file.
+        engine: ``"duckdb"`` or ``"sqlite"``.
+    """
+
+    def __init__(self, path: Path, engine: str) -> None:
+        self.path = path
+        self.engine = engine
+        if engine == "duckdb":
+            self._con = duckdb.connect(str(path))
+        else:
+            self._con = sqlite3.connect(str(path), check_same_thread=False)
+        self._lock = threading.Lock()
+        self._checked_at = time.monotonic()
+        self._retired = threading.Event()
+        with _open_lock:
+            _open_databases[path] += 1
+        self._finalizer = weakref.finalize(
+            self, _release, self._con, path, self._retired
+        )
+
+    @classmethod
+    def open(cls, engine: Optional[str] = None) -> SqlBackend:
+        """Open the database for the current data, building it if needed.
+
+        The database is loaded chunk by chunk from the CSV or the
+        partitioned dataset, validating each chunk like ``load_data``.
+        It is cached in ``data/.cache`` under a digest of the source
+        files' sizes and modification times; databases for earlier
+        versions of the files are deleted once a new one is built,
+        except those still open in this process.
+
+        Args:
+            engine: ``"duckdb"`` or ``"sqlite"``; DuckDB if importable
+                when omitted.
+
+        Returns:
+            SqlBackend over the loaded table.
+
+        Raises:
+            FileNotFoundError: If no data files exist.
+            ValueError: If required columns are missing.
+        """
+        engine = engine or ("duckdb" if duckdb is not None else "sqlite")
+        files = _source_files()
+        path = _database_path(files, engine)
+        if path.exists():
+            return cls(path, engine)
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Unique per builder, so concurrent workers never share it.
+        tmp_path = path.with_name(
+            f"{path.name}.{os.getpid()}-{uuid.uuid4().hex[:8]}.tmp"
+        )
+        backend = cls(tmp_path, engine)
+        created = False
+        for file in files:
+            for chunk in _read_chunks(file):
+                backend._insert(chunk[EXPECTED_COLUMNS], create=not created)
+                created = True
+        backend._create_indexes()
+        backend.close()
+        tmp_path.replace(path)
+        _remove_stale_databases(path)
+        return cls(path, engine)
+
+    def is_stale(self, refresh_seconds: float = 0.0) -> bool:
+        """Return whether the source files changed since the build.
+
+        Unlike ``SpendStore`` the database is not updated in place: a
+        stale backend should be replaced by a fresh ``open``, which
+        rebuilds the database from all files.
+
+        Args:
+            refresh_seconds: Minimum interval between file checks;
+                within it the backend is reported current.
+        """
+        now = time.monotonic()
+        if now - self._checked_at < refresh_seconds:
+            return False
+        self._checked_at = now
+        try:
+            files = _source_files()
+        except FileNotFoundError:
+            return False
+        return _database_path(files, self.engine) != self.path
+
+    def close(self) -> None:
+        """Close the database connection; later calls do nothing."""
+        self._finalizer()
+
+    def retire(self) -> None:
+        """Mark the database as superseded by a rebuild.
+
+        Sessions may still be reading it, so it is not closed here;
+        the file is deleted once the backend is closed or collected
+        and no other backend in this process has it open.
+        """
+        self._retired.set()
+
+    def _insert(self, frame: pd.DataFrame, create: bool) -> None:
+        """Append a validated frame, creating the table on first use."""
+        if self.engine == "duckdb":
+            statement = (
+                f"CREATE TABLE {TABLE} AS" if create
+                else f"INSERT INTO {TABLE}"
+            )
+            self._con.register("chunk", frame)
+            self._con.execute(f"{statement} SELECT * FROM chunk")
+            self._con.unregister("chunk")
+        else:
+            frame.to_sql(
+                TABLE,
+                self._con,
+                if_exists="replace" if create else "append",
+                index=False,
+            )
+
+    def _create_indexes(self) -> None:
+        """Index the date column, which every dashboard query filters."""
+        if self.engine == "sqlite":
+            self._con.execute(
+                f"CREATE INDEX {TABLE}_date ON {TABLE} (transaction_date)"
+            )
+            self._con.commit()
+
+    def _query(self, sql: str, params: list[Any]) -> pd.DataFrame:
+        """Run a query and return the result as a DataFrame."""
+        with self._lock:
+            if self.engine == "duckdb":
+                return self._con.execute(sql, params).fetchdf()
+            return pd.read_sql_query(sql, self._con, params=params)
+
+    def _date_param(self, value: date) -> Any:
+        """Return a date bound in the form the engine compares."""
+        if self.engine == "duckdb":
+            return datetime(value.year, value.month, value.day)
+        return value.isoformat()
+
+    def _where(
+        self,
+        date_range: Optional[tuple[date, date]] = None,
+        facilities: Optional[list[str]] = None,
+        categories: Optional[list[str]] = None,
+        vendors: Optional[list[str]] = None,
+        contract_types: Optional[list[str]] = None,
+        ppi_only: bool = False,
+    ) -> tuple[str, list[Any]]:
+        """Translate sidebar filters into a WHERE clause and parameters."""
+        clauses: list[str] = []
+        params: list[Any] = []
+        if date_range is not None:
+            clauses.append("transaction_date >= ? AND transaction_date < ?")
+            params += [
+                self._date_param(date_range[0]),
+                self._date_param(date_range[1] + timedelta(days=1)),
+            ]
+        for column, selected in (
+            ("facility_name", facilities),
+            ("spend_category", categories),
+            ("vendor_name", vendors),
+            ("contract_type", contract_types),
+        ):
+            if selected:
+                marks = ", ".join("?" for _ in selected)
+                clauses.append(f"{column} IN ({marks})")
+                params += list(selected)
+        if ppi_only:
+            clauses.append("ppi_flag")
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return where, params
+
+    def filter_options(self) -> dict:
+        """Return the date bounds and dimension values for the sidebar.
+
+        Returns:
+            Dictionary with keys min_date, max_date, facilities,
+            categories, vendors (ordered by total spend, descending)
+            and contract_types.
+        """
+        bounds = self._query(
+            f"SELECT MIN(transaction_date) AS lo, "
+            f"MAX(transaction_date) AS hi FROM {TABLE}",
+            [],
+        )
+
+        def _distinct(column: str) -> list[str]:
+            values = self._query(
+                f"SELECT DISTINCT {column} FROM {TABLE} ORDER BY 1", []
+            )
+            return values[column].tolist()
+
+        vendors = self._query(
+            f"SELECT vendor_name FROM {TABLE} GROUP BY vendor_name "
+            f"ORDER BY SUM(total_amount) DESC",
+            [],
+        )
+        return {
+            "min_date": pd.Timestamp(bounds["lo"].iloc[0]).date(),
+            "max_date": pd.Timestamp(bounds["hi"].iloc[0]).date(),
+            "facilities": _distinct("facility_name"),
+            "categories": _distinct("spend_category"),
+            "vendors": vendors["vendor_name"].tolist(),
+            "contract_types": _distinct("contract_type"),
+        }
+
+    def iter_rows(
+        self, chunk_rows: int, **filters: Any
+    ) -> Iterator[pd.DataFrame]:
+        """Yield the selected transactions in date and load order.
+
+        The rows are read over a separate cursor (or, for SQLite, a
+        separate connection), so a long export does not hold the lock
+        other sessions' queries wait on. At least one (possibly empty)
+        chunk is yielded.
+
+        Args:
+            chunk_rows: Maximum rows per chunk.
+            **filters: Sidebar filters; see the class docstring.
+        """
+        where, params = self._where(**filters)
+        sql = (
+            f"SELECT * FROM {TABLE} {where} "
+            f"ORDER BY transaction_date, rowid"
+        )
+        if self.engine == "duckdb":
+            cursor = self._con.cursor()
+            try:
+                reader = cursor.execute(sql, params).fetch_record_batch(
+                    chunk_rows
+                )
+                empty = True
+                for batch in reader:
+                    empty = False
+                    yield _decode_rows(batch.to_pandas())
+                if empty:
+                    # Writers need at least one frame to see the columns.
+                    yield _decode_rows(reader.schema.empty_table().to_pandas())
+            finally:
+                cursor.close()
+            return
+        # Read-only, so a database replaced by a rebuild is an error
+        # rather than silently recreated empty.
+        con = sqlite3.connect(
+            f"{self.path.resolve().as_uri()}?mode=ro", uri=True
+        )
+        try:
+            for chunk in pd.read_sql_query(
+                sql, con, params=params, chunksize=chunk_rows
+            ):
+                yield _decode_rows(chunk)
+        finally:
+            con.close()
+
+    def page_rows(
+        self,
+        sort_column: str,
+        descending: bool,
+        offset: int,
+        limit: int,
+        **filters: Any,
+    ) -> pd.DataFrame:
+        """Return one page of the selected transactions, sorted.
+
+        Ties are broken by load order (reversed when descending, as in
+        the in-memory explorer), so consecutive pages neither repeat
+        nor skip rows.
+
+        Args:
+            sort_column: One of ``EXPECTED_COLUMNS``.
+            descending: Sort largest first.
+            offset: Number of sorted rows to skip.
+            limit: Maximum number of rows to return.
+            **filters: Sidebar filters; see the class docstring.
+
+        Raises:
+            ValueError: If ``sort_column`` is not a spend column.
+        """
+        if sort_column not in EXPECTED_COLUMNS:
+            raise ValueError(f"Unknown sort column: {sort_column}")
+        where, params = self._where(**filters)
+        direction = "DESC" if descending else "ASC"
+        rows = self._query(
+            f"SELECT * FROM {TABLE} {where} "
+            f"ORDER BY {sort_column} {direction}, rowid {direction} "
+            f"LIMIT ? OFFSET ?",
+            params + [int(limit), int(offset)],
+        )
+        return _decode_rows(rows)
+
+    def kpis(self, **filters: Any) -> dict:
+        """Return the KPIs of a selection, like ``calculate_kpis``."""
+        where, params = self._where(**filters)
+        totals = self._query(
+            f"SELECT COALESCE(SUM(total_amount), 0) AS total_spend, "
+            f"COUNT(*) AS transaction_count, "
+            f"COUNT(DISTINCT vendor_name) AS unique_vendors, "
+            f"COALESCE(SUM(CASE WHEN ppi_flag THEN total_amount "
+            f"ELSE 0 END), 0) AS ppi_spend "
+            f"FROM {TABLE} {where}",
+            params,
+        ).iloc[0]
+        return kpis_from_totals(
+            float(totals["total_spend"]),
+            int(totals["transaction_count"]),
+            int(totals["unique_vendors"]),
+            float(totals["ppi_spend"]),
+        )
+
+    def prior_period_kpis(
+        self, current_start: date, current_end: date
+    ) -> dict:
+        """Return unfiltered KPIs for the preceding period.
+
+        Matches ``calculate_prior_period``: the prior period has the
+        same duration and ends the day before ``current_start``.
+        """
+        prior_end = current_start - timedelta(days=1)
+        prior_start = prior_end - (current_end - current_start)
+        return self.kpis(date_range=(prior_start, prior_end))
+
+    def aggregation_context(self, **filters: Any) -> AggregationContext:
+        """Return the chart aggregations of a selection.
+
+        The single grouping every chart rolls up from is computed by
+        the engine; see ``AggregationContext.from_base``.
+        """
+        if self.engine == "duckdb":
+            month = "date_trunc('month', transaction_date)"
+        else:
+            month = "substr(transaction_date, 1, 7) || '-01'"
+        keys = ", ".join(BASE_KEYS[1:])
+        where, params = self._where(**filters)
+        base = self._query(
+            f"SELECT {month} AS month, {keys}, "
+            f"SUM(total_amount) AS total_amount "
+            f"FROM {TABLE} {where} GROUP BY {month}, {keys}",
+            params,
+        )
+        base["month"] = pd.to_datetime(base["month"])
+        base["ppi_flag"] = base["ppi_flag"].astype(bool)
+        base["total_amount"] = base["total_amount"].astype("float64")
+        return AggregationContext.from_base(base)
+
+
+_swap_lock = threading.Lock()
+
+
+@st.cache_resource
+def _shared_backend(engine: Optional[str] = None) -> SqlBackend:
+    return SqlBackend.open(engine)
+
+
+def load_sql_backend(
+    engine: Optional[str] = None,
+    refresh_seconds: float = DEFAULT_REFRESH_SECONDS,
+) -> SqlBackend:
+    """Return the process-wide SQL backend; see ``SqlBackend.open``.
+
+    At most every ``refresh_seconds`` the source files are checked;
+    if they changed, the database is rebuilt from scratch and the
+    new backend replaces the shared one. Sessions holding the old
+    backend keep reading it until they fetch the new one; it is
+    retired, so its connection is closed and its file deleted once
+    the last of them lets go of it.
+
+    Args:
+        engine: ``"duckdb"`` or ``"sqlite"``; see ``SqlBackend.open``.
+        refresh_seconds: Minimum interval between file checks.
+    """
+    backend = _shared_backend(engine)
+    if backend.is_stale(refresh_seconds):
+        with _swap_lock:
+            if _shared_backend(engine) is backend:
+                _shared_backend.clear()
+                backend.retire()
+        backend = _shared_backend(engine)
+    return backend